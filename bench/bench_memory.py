@@ -0,0 +1,81 @@
+"""Memory held by the bot with and without LOW_MEMORY.
+
+    python -m bench.bench_memory [guilds] [members_per_guild] [rostered_per_guild]
+
+Each mode runs in its own process: it loads `guilds` guilds of
+`members_per_guild` members through bench.fakediscord, puts
+`rostered_per_guild` of them on each roster and renders every roster
+until no name is still loading. It then reports the Python heap in use
+(tracemalloc, after gc) and whether every roster finished loading names.
+"""
+import asyncio
+import gc
+import json
+import os
+import subprocess
+import sys
+import tracemalloc
+
+
+async def child(guilds: int, members: int, rostered: int):
+    import bot.main as sybot
+    from bench.fakediscord import FakeGateway, FakeHTTP
+    from bot.roster import STATUSES
+
+    gateway = FakeGateway(sybot.bot, FakeHTTP(latency=0.001))
+    await gateway.connect()
+    await sybot.load_extensions()
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+
+    guild_ids = []
+    for i in range(guilds):
+        gid = (i + 1) << 22
+        gateway.add_guild(gid, [gid + 1], range(1000, 1000 + members))
+        sybot.set_roster(gid, gid + 1, gid + 2)
+        for uid in range(1000, 1000 + rostered):
+            sybot.set_status(gid, uid, "Modding" if uid % 3 else "Away")
+        guild_ids.append(gid)
+
+    def loading() -> bool:
+        return any(sybot.get_roster_model(sybot.bot.get_guild(gid), gid).missing(status)
+                   for gid in guild_ids for status in STATUSES)
+
+    for _ in range(50):
+        texts = [sybot.build_roster_text(sybot.bot.get_guild(gid)) for gid in guild_ids]
+        if not loading():
+            break
+        await asyncio.sleep(sybot.name_cache.batch_delay)
+
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - before
+    print(json.dumps({
+        "heap_mb": round(used / 2**20, 2),
+        "cached_members": sum(len(sybot.bot.get_guild(gid).members) for gid in guild_ids),
+        "names_cached": len(sybot.name_cache),
+        "all_names_resolved": not loading(),
+    }))
+
+
+def run_mode(low_memory: bool, args: list) -> dict:
+    env = dict(os.environ, STATE_DB=":memory:", MEMBERS_INTENT="1", LOW_MEMORY="1" if low_memory else "0")
+    out = subprocess.run([sys.executable, "-m", "bench.bench_memory", "--child", *args],
+                         env=env, check=True, capture_output=True, text=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main(args: list):
+    guilds, members, rostered = (int(a) for a in (args + ["20", "5000", "30"][len(args):]))
+    print(f"{guilds} guilds x {members} members, {rostered} rostered per guild")
+    for label, low in (("default", False), ("LOW_MEMORY", True)):
+        r = run_mode(low, [str(guilds), str(members), str(rostered)])
+        print(f"{label:11} heap={r['heap_mb']:8.2f} MB  cached members={r['cached_members']:7}  "
+              f"names cached={r['names_cached']:5}  all names resolved={r['all_names_resolved']}")
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--child"]:
+        asyncio.run(child(*(int(a) for a in sys.argv[2:5])))
+    else:
+        main(sys.argv[1:])
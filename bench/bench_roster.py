@@ -0,0 +1,77 @@
+"""Render cost of a large roster: full rescan vs. RosterModel.
+
+    python -m bench.bench_roster [entries]
+
+The guild has `entries` users, most of them Away. Each round changes one
+user's status and renders all three name lists, once by walking every
+entry (what build_roster_text used to do) and once through RosterModel.
+"""
+import random
+import sys
+import time
+
+from bot.roster import STATUSES, RosterModel
+
+
+class Member:
+    def __init__(self, uid: int):
+        self.display_name = f"mod-{uid}"
+
+
+class Guild:
+    def __init__(self, uids):
+        self.members = {uid: Member(uid) for uid in uids}
+
+    def get_member(self, uid: int):
+        return self.members.get(uid)
+
+
+def full_scan(guild: Guild, gmap: dict) -> str:
+    buckets = {s: [] for s in STATUSES}
+    for uid, status in gmap.items():
+        member = guild.get_member(uid)
+        buckets[status].append(member.display_name if member else f"<@{uid}>")
+    return "\n".join(", ".join(buckets[s]) for s in STATUSES)
+
+
+def model_render(model: RosterModel) -> str:
+    return "\n".join(model.names(s) for s in STATUSES)
+
+
+def main(entries: int, rounds: int = 200):
+    rng = random.Random(0)
+    uids = list(range(1, entries + 1))
+    guild = Guild(uids)
+    gmap = {uid: ("Away" if rng.random() < 0.95 else rng.choice(STATUSES)) for uid in uids}
+    model = RosterModel()
+    for uid, status in gmap.items():
+        model.set(uid, status, guild.get_member(uid).display_name)
+    changes = [(rng.choice(uids), rng.choice(("Modding", "Break"))) for _ in range(rounds)]
+
+    start = time.perf_counter()
+    for uid, status in changes:
+        gmap[uid] = status
+        full_scan(guild, gmap)
+    scan = (time.perf_counter() - start) / rounds
+
+    start = time.perf_counter()
+    for uid, status in changes:
+        model.set(uid, status, guild.get_member(uid).display_name)
+        model_render(model)
+    incremental = (time.perf_counter() - start) / rounds
+
+    # Modding <-> Break moves never touch the big Away bucket
+    start = time.perf_counter()
+    for i, (uid, _) in enumerate(changes):
+        model.set(uid, "Modding" if i % 2 else "Break", guild.get_member(uid).display_name)
+        model_render(model)
+    no_away = (time.perf_counter() - start) / rounds
+
+    print(f"entries:                  {entries}")
+    print(f"full scan per render:     {scan * 1e3:.3f} ms")
+    print(f"RosterModel per render:   {incremental * 1e3:.3f} ms")
+    print(f"  without Away changes:   {no_away * 1e3:.3f} ms")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10_000)
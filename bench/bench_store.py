@@ -0,0 +1,59 @@
+"""Cost of persisting state with StateStore.
+
+    python -m bench.bench_store [guilds] [users_per_guild]
+
+Reports the per-event write overhead seen by the event loop, the time the
+background writer needs per batch, and how long a warm restart takes to
+load everything back.
+"""
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+from bot.store import StateStore
+
+STATUSES = ("Modding", "Break", "Away")
+
+
+async def run(guilds: int, users: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        store = StateStore(path)
+        events = guilds * users
+        rng = random.Random(0)
+        writes = [(rng.randrange(guilds), rng.randrange(users) + 10_000, rng.choice(STATUSES))
+                  for _ in range(events)]
+
+        start = time.perf_counter()
+        for gid, uid, status in writes:
+            store.set_status(gid, uid, status)
+        for gid in range(guilds):
+            store.set_roster(gid, gid + 1, gid + 2)
+        enqueue = time.perf_counter() - start
+
+        start = time.perf_counter()
+        await store.flush()
+        flush = time.perf_counter() - start
+
+        await store.close()
+
+        start = time.perf_counter()
+        store = StateStore(path)
+        statuses, rosters, _ = store.load()
+        load = time.perf_counter() - start
+        rows = sum(len(g) for g in statuses.values())
+        await store.close()
+
+    print(f"events:           {events}")
+    print(f"write per event:  {enqueue / events * 1e6:.2f} us (on the event loop)")
+    print(f"batch flush:      {flush * 1e3:.1f} ms (worker thread)")
+    print(f"warm load:        {load * 1e3:.1f} ms for {len(rosters)} rosters / {rows} statuses")
+
+
+if __name__ == "__main__":
+    guilds = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    users = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    asyncio.run(run(guilds, users))
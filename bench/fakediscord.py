@@ -0,0 +1,171 @@
+"""A local stand-in for the Discord HTTP API and gateway.
+
+FakeHTTP replaces the bot's HTTPClient. Every call is counted per method,
+takes `latency` seconds and returns a payload the library can parse, or
+raises an error queued with FakeHTTP.fail.
+Reaction changes made over HTTP are echoed back through the gateway, the
+way Discord does it.
+
+FakeGateway feeds raw gateway payloads through the library's own parsers
+(ConnectionState.parse_*), so handlers run exactly as they would live. It
+also answers member requests (Guild.query_members) from the guilds it
+created.
+"""
+import asyncio
+import itertools
+from collections import Counter, defaultdict
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional, Sequence
+
+import discord
+from discord.ext import commands
+
+BOT_ID = 1
+
+
+def user_data(uid: int) -> Dict[str, Any]:
+    return {"id": str(uid), "username": f"user{uid}", "discriminator": "0", "avatar": None,
+            "global_name": None}
+
+
+def message_data(channel_id: int, message_id: int, content: str = "", author_id: int = BOT_ID) -> Dict[str, Any]:
+    return {
+        "id": str(message_id), "channel_id": str(channel_id), "type": 0, "content": content,
+        "author": user_data(author_id), "attachments": [], "embeds": [], "mentions": [],
+        "mention_roles": [], "pinned": False, "mention_everyone": False, "tts": False,
+        "timestamp": "2024-01-01T00:00:00+00:00", "edited_timestamp": None, "reactions": [],
+    }
+
+
+def member_data(uid: int) -> Dict[str, Any]:
+    return {"user": user_data(uid), "roles": [], "joined_at": "2024-01-01T00:00:00+00:00",
+            "nick": f"mod-{uid}", "deaf": False, "mute": False, "flags": 0}
+
+
+def guild_data(guild_id: int, channel_ids: List[int], member_ids: Sequence[int]) -> Dict[str, Any]:
+    return {
+        "id": str(guild_id), "name": f"guild{guild_id}", "owner_id": str(BOT_ID),
+        "member_count": len(member_ids), "large": len(member_ids) > 250,
+        "roles": [{"id": str(guild_id), "name": "@everyone", "permissions": "0", "position": 0,
+                   "color": 0, "hoist": False, "managed": False, "mentionable": False}],
+        "channels": [{"id": str(cid), "type": 0, "name": f"roster{cid}", "position": i,
+                      "permission_overwrites": []} for i, cid in enumerate(channel_ids)],
+        "members": [member_data(uid) for uid in member_ids],
+        "emojis": [], "stickers": [], "features": [], "voice_states": [], "presences": [],
+        "threads": [], "stage_instances": [], "guild_scheduled_events": [],
+    }
+
+
+def not_found(code: int, message: str = "Unknown Message") -> discord.NotFound:
+    """The error Discord answers with for a missing resource (10008 = Unknown Message)."""
+    return discord.NotFound(SimpleNamespace(status=404, reason="Not Found"), {"code": code, "message": message})
+
+
+class FakeHTTP:
+    """Counts calls per HTTPClient method and answers after `latency` seconds."""
+
+    def __init__(self, latency: float = 0.05):
+        self.latency = latency
+        self.calls: Counter = Counter()
+        self.gateway: Optional["FakeGateway"] = None
+        self._ids = itertools.count(10**17)
+        self._failures: Dict[str, List[Exception]] = defaultdict(list)
+        self.contents: Dict[int, str] = {}   # message id -> what it shows now
+
+    def fail(self, name: str, error: Exception):
+        """Make the next call of `name` raise `error`."""
+        self._failures[name].append(error)
+
+    def __getattr__(self, name: str):
+        async def call(*args, **kwargs):
+            self.calls[name] += 1
+            await asyncio.sleep(self.latency)
+            if self._failures.get(name):
+                raise self._failures[name].pop(0)
+            return self._answer(name, args, kwargs)
+        return call
+
+    def _answer(self, name: str, args: tuple, kwargs: dict) -> Any:
+        params = kwargs.get("params")
+        content = ((params.payload if params else None) or {}).get("content") or ""
+        if name == "edit_message":
+            self.contents[int(args[1])] = content
+        if name in ("edit_message", "get_message"):
+            return message_data(args[0], args[1], content)
+        if name == "send_message":
+            message_id = next(self._ids)
+            self.contents[message_id] = content
+            return message_data(args[0], message_id, content)
+        if name == "delete_message":
+            self.contents.pop(int(args[1]), None)
+        if name == "remove_reaction" and self.gateway is not None:
+            channel_id, message_id, emoji, member_id = args[:4]
+            self.gateway.echo_remove(channel_id, message_id, member_id, emoji)
+        if name == "get_reaction_users":
+            return []
+        return None
+
+
+class FakeResponse:
+    """Stands in for Interaction.response; `sent` lists what was answered."""
+
+    def __init__(self):
+        self.sent: List[str] = []
+
+    async def defer(self, **kwargs):
+        self.sent.append("defer")
+
+    async def edit_message(self, content: str, **kwargs):
+        self.sent.append(content)
+
+    async def send_message(self, content: str, **kwargs):
+        self.sent.append(content)
+
+
+class FakeGateway:
+    """Pushes gateway events into a bot through the library's parsers."""
+
+    def __init__(self, bot: commands.Bot, http: FakeHTTP):
+        self.bot = bot
+        self.state = bot._connection
+        self.http = http
+        http.gateway = self
+        self.state.http = http
+        bot.http = http
+        self.state.user = discord.ClientUser(state=self.state, data=user_data(BOT_ID))
+        self.state.query_members = self._query_members
+        self._channel_guild: Dict[int, int] = {}
+        self._members: Dict[int, Sequence[int]] = {}
+
+    async def connect(self):
+        """Bind the bot to the running loop, as logging in would."""
+        await self.bot._async_setup_hook()
+
+    def add_guild(self, guild_id: int, channel_ids: List[int], member_ids: Sequence[int]) -> discord.Guild:
+        for cid in channel_ids:
+            self._channel_guild[cid] = guild_id
+        self._members[guild_id] = member_ids
+        return self.state._add_guild_from_data(guild_data(guild_id, channel_ids, member_ids))
+
+    async def _query_members(self, guild: discord.Guild, query: Optional[str], limit: int,
+                             user_ids: Optional[List[int]], cache: bool, presences: bool) -> List[discord.Member]:
+        self.http.calls["query_members"] += 1
+        await asyncio.sleep(self.http.latency)
+        known = self._members.get(guild.id, ())
+        return [discord.Member(data=member_data(uid), guild=guild, state=self.state)
+                for uid in user_ids or () if uid in known][:limit]
+
+    def _reaction(self, channel_id: int, message_id: int, user_id: int, emoji: str) -> Dict[str, Any]:
+        return {"user_id": str(user_id), "channel_id": str(channel_id), "message_id": str(message_id),
+                "guild_id": str(self._channel_guild[channel_id]), "emoji": {"id": None, "name": emoji},
+                "type": 0, "burst": False}
+
+    def react(self, channel_id: int, message_id: int, user_id: int, emoji: str):
+        self.state.parse_message_reaction_add(self._reaction(channel_id, message_id, user_id, emoji))
+
+    def unreact(self, channel_id: int, message_id: int, user_id: int, emoji: str):
+        self.state.parse_message_reaction_remove(self._reaction(channel_id, message_id, user_id, emoji))
+
+    def echo_remove(self, channel_id: int, message_id: int, user_id: int, emoji: str):
+        # Discord follows a successful removal with a gateway event
+        asyncio.get_running_loop().call_soon(self.unreact, int(channel_id), int(message_id), int(user_id), emoji)
@@ -0,0 +1,172 @@
+"""Replay synthetic reaction storms against bot/main.py, offline.
+
+    python -m bench.replay [--latency 0.05] [--json results.json] [scenario ...]
+
+The bot's handlers run unchanged on top of bench.fakediscord: events go in
+through the library's gateway parsers and every REST call is answered by
+FakeHTTP after --latency seconds. For each scenario this reports handler
+latency (p50/p99), REST calls per event and roster edits per second, and
+--json writes the same numbers for regression tracking.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import time
+from typing import Callable, Dict, List
+
+os.environ.setdefault("STATE_DB", ":memory:")
+os.environ.setdefault("MEMBERS_INTENT", "1")   # so guild members land in the member cache
+os.environ.setdefault("ROSTER_EDIT_WINDOW", "0.25")
+os.environ.setdefault("ROSTER_EDIT_MAX_LATENCY", "1")
+
+import bot.main as sybot  # noqa: E402
+from bench.fakediscord import FakeGateway, FakeHTTP  # noqa: E402
+from bot.reactions import ReactionIndex  # noqa: E402
+
+HANDLERS = ("on_raw_reaction_add", "on_raw_reaction_remove")
+
+_next_guild = iter(range(1, 10**6))
+
+
+class Replay:
+    def __init__(self, latency: float):
+        self.http = FakeHTTP(latency)
+        self.gateway = FakeGateway(sybot.bot, self.http)
+        self.samples: List[float] = []
+        self.inflight = 0
+
+    async def connect(self):
+        """Connect the fake gateway, load the bot's extensions and time their reaction listeners."""
+        await self.gateway.connect()
+        await sybot.load_extensions()
+        for name in HANDLERS:
+            listeners = sybot.bot.extra_events[name]
+            listeners[:] = [self._timed(listener) for listener in listeners]
+
+    def _timed(self, handler: Callable):
+        async def timed(*args):
+            self.inflight += 1
+            start = time.perf_counter()
+            try:
+                await handler(*args)
+            finally:
+                self.samples.append(time.perf_counter() - start)
+                self.inflight -= 1
+        return timed
+
+    def roster(self, members: int, statuses: Dict[int, str]) -> tuple:
+        """A guild with `members` members and a roster where `statuses` already reacted."""
+        gid = next(_next_guild) << 22
+        cid, mid = gid + 1, gid + 2
+        self.gateway.add_guild(gid, [cid], range(1000, 1000 + members))
+        sybot.set_roster(gid, cid, mid)
+        index = sybot.reaction_index[gid] = ReactionIndex()
+        emoji = {"Modding": sybot.EMO_ACTIVE, "Break": sybot.EMO_BREAK, "Away": sybot.EMO_AWAY}
+        for uid, status in statuses.items():
+            sybot.set_status(gid, uid, status)
+            index.add(uid, emoji[status])
+        return gid, cid, mid
+
+    async def settle(self):
+        """Wait until handlers, reaction removals, echoed events and roster edits have all finished."""
+        quiet = 0
+        while quiet < 3:
+            await asyncio.sleep(self.http.latency)
+            busy = self.inflight or sybot.roster_edits.active() or sybot.cleanup_tasks
+            quiet = 0 if busy else quiet + 1
+
+    async def run(self, name: str, events: List[tuple], spread: float) -> dict:
+        """Fire (kind, channel, message, user, emoji) events evenly over `spread` seconds."""
+        self.samples.clear()
+        self.http.calls.clear()
+        start = time.perf_counter()
+        gap = spread / max(len(events), 1)
+        for kind, cid, mid, uid, emoji in events:
+            (self.gateway.react if kind == "add" else self.gateway.unreact)(cid, mid, uid, emoji)
+            await asyncio.sleep(gap)
+        await self.settle()
+        duration = time.perf_counter() - start
+
+        samples = sorted(self.samples)
+        calls = sum(self.http.calls.values())
+        edits = self.http.calls["edit_message"]
+        return {
+            "scenario": name,
+            "events": len(samples),
+            "handler_p50_ms": round(statistics.median(samples) * 1e3, 3),
+            "handler_p99_ms": round(samples[int(len(samples) * 0.99) - 1] * 1e3, 3),
+            "rest_calls": calls,
+            "rest_calls_per_event": round(calls / len(samples), 3),
+            "edits": edits,
+            "edits_per_sec": round(edits / duration, 2),
+            "duration_s": round(duration, 3),
+            "calls_by_method": dict(self.http.calls),
+        }
+
+
+async def shift_change(replay: Replay, guilds: int = 50, mods: int = 25) -> dict:
+    """Every mod of every guild switches from Away to Modding within 3 seconds."""
+    events = []
+    for _ in range(guilds):
+        uids = list(range(1000, 1000 + mods))
+        gid, cid, mid = replay.roster(mods * 4, {uid: "Away" for uid in uids})
+        events += [("add", cid, mid, uid, sybot.EMO_ACTIVE) for uid in uids]
+    random.Random(1).shuffle(events)
+    return await replay.run("shift_change", events, spread=3.0)
+
+
+async def mass_clear(replay: Replay, guilds: int = 50, mods: int = 25) -> dict:
+    """Every mod of every guild takes their reaction off within 1 second."""
+    events = []
+    for _ in range(guilds):
+        uids = list(range(1000, 1000 + mods))
+        gid, cid, mid = replay.roster(mods * 4, {uid: "Modding" for uid in uids})
+        events += [("remove", cid, mid, uid, sybot.EMO_ACTIVE) for uid in uids]
+    random.Random(2).shuffle(events)
+    return await replay.run("mass_clear", events, spread=1.0)
+
+
+async def big_guild(replay: Replay, members: int = 10_000, clicks: int = 200) -> dict:
+    """A 10k-member guild whose roster holds every member as a historical Away
+    entry (no reaction left); 200 of them clock in or take a break."""
+    uids = range(1000, 1000 + members)
+    gid, cid, mid = replay.roster(members, {})
+    for uid in uids:
+        sybot.set_status(gid, uid, "Away")
+    rng = random.Random(3)
+    choices = (sybot.EMO_ACTIVE, sybot.EMO_BREAK)
+    events = [("add", cid, mid, uid, rng.choice(choices)) for uid in rng.sample(uids, clicks)]
+    return await replay.run("big_guild", events, spread=2.0)
+
+
+SCENARIOS = {"shift_change": shift_change, "mass_clear": mass_clear, "big_guild": big_guild}
+
+
+async def main(args: argparse.Namespace):
+    replay = Replay(args.latency)
+    await replay.connect()
+    results = []
+    for name in args.scenarios or SCENARIOS:
+        result = await SCENARIOS[name](replay)
+        results.append(result)
+        print(f"{name:13} events={result['events']:5}  p50={result['handler_p50_ms']:8.3f} ms  "
+              f"p99={result['handler_p99_ms']:8.3f} ms  rest/event={result['rest_calls_per_event']:.3f}  "
+              f"edits/s={result['edits_per_sec']:.2f}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"latency_s": args.latency, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("scenarios", nargs="*", help=f"any of {', '.join(SCENARIOS)} (default: all)")
+    parser.add_argument("--latency", type=float, default=0.05, help="simulated REST round trip in seconds")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+    unknown = set(args.scenarios).difference(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenario: {', '.join(sorted(unknown))}")
+    asyncio.run(main(args))
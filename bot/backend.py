@@ -0,0 +1,199 @@
+import asyncio
+import itertools
+import json
+import logging
+import uuid
+from typing import Callable, Dict, Optional, Tuple
+
+RosterLoc = Optional[Tuple[int, int]]   # (channel_id, message_id), None = no roster
+
+StatusListener = Callable[[int, int, str], None]
+RosterListener = Callable[[int, RosterLoc], None]
+NameListener = Callable[[int, int, str], None]
+
+
+class StateBackend:
+    """Where status and roster changes are published.
+
+    The bot applies its own changes locally first and then hands them to
+    the backend. Changes the backend decides on are reported through
+    on_status(guild_id, user_id, status), on_roster(guild_id, loc) and
+    on_name(roster_id, guild_id, name), in the backend's order; listeners
+    must ignore changes they already hold. Status and roster changes are
+    keyed by roster id, which is the guild id for a guild's default roster.
+
+    This base class is the in-process backend: the process's own dicts are
+    the only copy, so there is nothing to publish or report.
+    """
+
+    def __init__(self):
+        self.on_status: Optional[StatusListener] = None
+        self.on_roster: Optional[RosterListener] = None
+        self.on_name: Optional[NameListener] = None
+
+    async def start(self, statuses: Dict[int, Dict[int, str]], rosters: Dict[int, Tuple[int, int]],
+                    names: Dict[int, Tuple[int, str]]):
+        """Join the backend, offering the state this process loaded for keys it lacks."""
+
+    def set_status(self, guild_id: int, user_id: int, status: str):
+        pass
+
+    def set_roster(self, guild_id: int, loc: RosterLoc):
+        pass
+
+    def name_roster(self, roster_id: int, guild_id: int, name: str):
+        pass
+
+    async def close(self):
+        pass
+
+
+class SocketBackend(StateBackend):
+    """State shared by several bot processes through bot.stateserver.
+
+    Every change goes to the server over a Unix socket as one JSON line,
+    tagged with this process's origin id and a sequence number. The server
+    applies changes one at a time and sends each of them to all connected
+    processes, the sender included, so every process ends up with the
+    same value even when two of them write the same key at once.
+
+    A change stays pending until its echo comes back. The echo itself is
+    not applied again, and changes from other processes to a key with a
+    pending change are skipped: the server applied them first, so the
+    pending change overrides them. If the connection drops the bot keeps
+    working on its local state and reconnects in the background; on
+    reconnecting the server's copy wins for keys it already holds, except
+    keys changed here meanwhile, whose pending changes are sent again.
+    """
+
+    def __init__(self, path: str, retry: float = 5.0):
+        super().__init__()
+        self.path = path
+        self.retry = retry
+        self.origin = uuid.uuid4().hex
+        self._seq = itertools.count(1)
+        self._pending: Dict[tuple, dict] = {}   # key -> newest change not yet echoed
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._task: Optional[asyncio.Task] = None
+        self._seed: Callable[[], dict] = dict
+
+    async def start(self, statuses: Dict[int, Dict[int, str]], rosters: Dict[int, Tuple[int, int]],
+                    names: Dict[int, Tuple[int, str]]):
+        self._seed = lambda: {
+            "op": "seed",
+            "names": [[rid, *owner] for rid, owner in names.items()],
+            "statuses": [[gid, uid, s] for gid, gmap in statuses.items() for uid, s in gmap.items()],
+            "rosters": [[gid, *loc] for gid, loc in rosters.items()],
+        }
+        try:
+            reader = await self._connect()
+        except (OSError, ValueError) as e:
+            logging.warning("State server at %s unavailable, running on local state: %s", self.path, e)
+            reader = None
+        self._task = asyncio.create_task(self._run(reader))
+
+    async def _connect(self) -> asyncio.StreamReader:
+        reader, writer = await asyncio.open_unix_connection(self.path, limit=2 ** 24)
+        self._send(self._seed(), writer)
+        await writer.drain()
+        # the server answers the seed with every change it holds
+        snapshot = json.loads(await reader.readline())
+        for rid, gid, name in snapshot["names"]:
+            if ("name", rid) not in self._pending:
+                self._name(rid, gid, name)
+        for gid, uid, status in snapshot["statuses"]:
+            if ("status", gid, uid) not in self._pending:
+                self._status(gid, uid, status)
+        for gid, cid, mid in snapshot["rosters"]:
+            if ("roster", gid) not in self._pending:
+                self._roster(gid, (cid, mid))
+        # changes made while disconnected (or sent but never echoed)
+        for change in sorted(self._pending.values(), key=lambda c: c["seq"]):
+            self._send(change, writer)
+        self._writer = writer
+        logging.info("Joined state server at %s (%d statuses, %d rosters)",
+                     self.path, len(snapshot["statuses"]), len(snapshot["rosters"]))
+        return reader
+
+    async def _run(self, reader: Optional[asyncio.StreamReader]):
+        while True:
+            if reader is not None:
+                try:
+                    while line := await reader.readline():
+                        change = json.loads(line)
+                        if not self._is_news(change):
+                            continue
+                        if change["op"] == "status":
+                            self._status(change["guild_id"], change["user_id"], change["status"])
+                        elif change["op"] == "roster":
+                            loc = change["loc"]
+                            self._roster(change["guild_id"], tuple(loc) if loc else None)
+                        elif change["op"] == "name":
+                            self._name(change["roster_id"], change["guild_id"], change["name"])
+                except (OSError, ValueError) as e:
+                    logging.warning("State server connection failed: %s", e)
+                self._writer = None
+                logging.warning("Lost the state server at %s, retrying every %ss", self.path, self.retry)
+            await asyncio.sleep(self.retry)
+            try:
+                reader = await self._connect()
+            except (OSError, ValueError):
+                reader = None
+
+    @staticmethod
+    def _key(change: dict) -> tuple:
+        if change["op"] == "status":
+            return ("status", change["guild_id"], change["user_id"])
+        if change["op"] == "roster":
+            return ("roster", change["guild_id"])
+        return ("name", change["roster_id"])
+
+    def _is_news(self, change: dict) -> bool:
+        """Whether a change from the server should be applied here."""
+        key = self._key(change)
+        if change.get("origin") == self.origin:
+            # our own change: already applied locally
+            pending = self._pending.get(key)
+            if pending is not None and pending["seq"] == change["seq"]:
+                del self._pending[key]
+            return False
+        return key not in self._pending
+
+    def _status(self, guild_id: int, user_id: int, status: str):
+        if self.on_status is not None:
+            self.on_status(guild_id, user_id, status)
+
+    def _roster(self, guild_id: int, loc: RosterLoc):
+        if self.on_roster is not None:
+            self.on_roster(guild_id, loc)
+
+    def _name(self, roster_id: int, guild_id: int, name: str):
+        if self.on_name is not None:
+            self.on_name(roster_id, guild_id, name)
+
+    def _send(self, message: dict, writer: Optional[asyncio.StreamWriter] = None):
+        writer = writer or self._writer
+        if writer is not None:
+            writer.write(json.dumps(message).encode() + b"\n")
+
+    def _change(self, change: dict):
+        change.update(origin=self.origin, seq=next(self._seq))
+        self._pending[self._key(change)] = change
+        self._send(change)
+
+    def set_status(self, guild_id: int, user_id: int, status: str):
+        self._change({"op": "status", "guild_id": guild_id, "user_id": user_id, "status": status})
+
+    def set_roster(self, guild_id: int, loc: RosterLoc):
+        self._change({"op": "roster", "guild_id": guild_id, "loc": list(loc) if loc else None})
+
+    def name_roster(self, roster_id: int, guild_id: int, name: str):
+        self._change({"op": "name", "roster_id": roster_id, "guild_id": guild_id, "name": name})
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
@@ -0,0 +1,70 @@
+"""Reporting commands (shift statistics, shard health) and the owner's /clock_reload."""
+import logging
+from typing import Literal, Optional
+
+import discord
+from discord import app_commands
+from discord.ext import commands
+
+import bot.main as core
+from bot.stats import format_duration
+
+
+class ClockCommands(commands.Cog):
+    def __init__(self, bot: commands.Bot):
+        self.bot = bot
+
+    @app_commands.command(name="clock_stats", description="Show who spent the most time modding.")
+    @app_commands.describe(window="Time span to report on", member="Show one member instead of the leaderboard",
+                           roster="Named roster to report on (the server's main roster by default)")
+    @app_commands.autocomplete(roster=core.roster_autocomplete)
+    @core.handler_seconds.time(handler="clock_stats")
+    async def clock_stats(self, interaction: discord.Interaction, window: Literal["day", "week", "month"] = "week",
+                          member: Optional[discord.Member] = None, roster: Optional[str] = None):
+        guild = interaction.guild
+        if guild is None:
+            await interaction.response.send_message("This command can only be used in a server.", ephemeral=True)
+            return
+        rid = core.find_roster(guild.id, roster)
+        if rid is None:
+            await interaction.response.send_message(f"There is no roster named **{roster}** here.", ephemeral=True)
+            return
+        if member is not None:
+            totals = core.shift_stats.totals(rid, member.id, window)
+            text = (f"{member.display_name} over the last {window}: 🟢 {format_duration(totals['Modding'])} modding, "
+                    f"☕ {format_duration(totals['Break'])} on break")
+        else:
+            lines = [f"{i}. {core.display_name(guild, uid) or uid} — {format_duration(seconds)}"
+                     for i, (uid, seconds) in enumerate(core.shift_stats.top(rid, window), 1)]
+            text = f"**Most time modding, last {window}**\n" + ("\n".join(lines) or "Nobody yet.")
+        await interaction.response.send_message(text, ephemeral=True)
+
+    @app_commands.command(name="clock_shards", description="Show gateway latency and event rates per shard.")
+    async def clock_shards(self, interaction: discord.Interaction):
+        text = "\n".join(core.shard_report()) or "No shards connected."
+        await interaction.response.send_message(f"```\n{text}\n```", ephemeral=True)
+
+    @app_commands.command(name="clock_reload", description="Reload the bot's extensions without restarting (owner only).")
+    @app_commands.describe(extension="Extension to reload (all by default)")
+    async def clock_reload(self, interaction: discord.Interaction, extension: Optional[str] = None):
+        if not await self.bot.is_owner(interaction.user):
+            await interaction.response.send_message("Only the bot owner can reload extensions.", ephemeral=True)
+            return
+        names = [extension] if extension else core.EXTENSIONS
+        unknown = [name for name in names if name not in core.EXTENSIONS]
+        if unknown:
+            await interaction.response.send_message(f"Unknown extension: {', '.join(unknown)}", ephemeral=True)
+            return
+        await interaction.response.defer(ephemeral=True, thinking=True)
+        try:
+            await self.bot.reload_extensions([f"{core.EXTENSION_PACKAGE}.{name}" for name in names])
+            await core.sync_commands()   # a no-op unless the commands changed
+        except Exception as e:
+            logging.exception("Reloading %s failed", names)
+            await interaction.followup.send(f"Reload failed, the previous code is still running: {e}", ephemeral=True)
+            return
+        await interaction.followup.send(f"Reloaded {', '.join(names)}.", ephemeral=True)
+
+
+async def setup(bot: commands.Bot):
+    await bot.add_cog(ClockCommands(bot))
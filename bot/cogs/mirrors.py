@@ -0,0 +1,100 @@
+"""Mirror channels: read-only copies of a guild's roster in other guilds.
+
+ROSTER_MIRRORS maps a source guild to channels anywhere the bot can post.
+Each mirror channel holds one message that is edited from the same
+snapshot as the roster message and the topic. Its id is kept in the state
+store, and edits are last-write-wins: while one is in flight only the
+newest text waits, so a busy roster costs one edit per mirror at a time.
+"""
+import asyncio
+import logging
+from typing import Dict
+
+import discord
+from discord.ext import commands
+
+import bot.main as core
+from bot.logs import untraced_task
+from bot.roster import RosterSnapshot
+
+MESSAGE_LIMIT = 2000
+
+
+def mirror_text(guild: discord.Guild, snap: RosterSnapshot) -> str:
+    stamp = core.stamp_line(snap)
+    text = "\n".join((f"**{guild.name}**", *snap.pages, stamp))
+    if len(text) > MESSAGE_LIMIT:
+        text = "\n".join((f"**{guild.name}**", snap.pages[0], f"… more in {guild.name}", stamp))
+    return text[:MESSAGE_LIMIT]
+
+
+class Mirrors(commands.Cog):
+    def __init__(self, bot: commands.Bot):
+        self.bot = bot
+        state = core.take_handover(self.qualified_name)
+        self.latest: Dict[int, str] = state.get("latest", {})     # channel id -> text waiting to be shown
+        self.shown: Dict[int, str] = state.get("shown", {})
+        self.messages: Dict[int, int] = state.get("messages", {})  # channel id -> mirror message id
+        self.tasks: Dict[int, asyncio.Task] = {}
+
+    async def cog_load(self):
+        core.roster_outputs.append(self.publish)
+        for channel_id in list(self.latest):
+            self.start(channel_id)
+
+    async def cog_unload(self):
+        core.roster_outputs.remove(self.publish)
+        for task in self.tasks.values():
+            task.cancel()
+        core.handover[self.qualified_name] = {"latest": self.latest, "shown": self.shown, "messages": self.messages}
+
+    def publish(self, guild: discord.Guild):
+        targets = core.ROSTER_MIRRORS.get(guild.id)
+        if not targets:
+            return
+        text = mirror_text(guild, core.roster_snapshot(guild))
+        for channel_id in targets:
+            self.latest[channel_id] = text
+            self.start(channel_id)
+
+    def start(self, channel_id: int):
+        if channel_id not in self.tasks:
+            self.tasks[channel_id] = untraced_task(self.run(channel_id))
+
+    async def run(self, channel_id: int):
+        try:
+            while channel_id in self.latest:
+                text = self.latest[channel_id]
+                if text != self.shown.get(channel_id):
+                    try:
+                        await self.show(channel_id, text)
+                    except discord.HTTPException as e:
+                        logging.warning("Could not update the roster mirror in channel %s: %s", channel_id, e)
+                    else:
+                        self.shown[channel_id] = text
+                # a newer text may have arrived during the edit
+                if self.latest.get(channel_id) is text:
+                    del self.latest[channel_id]
+        finally:
+            self.tasks.pop(channel_id, None)
+
+    async def show(self, channel_id: int, text: str):
+        channel = self.bot.get_partial_messageable(channel_id)
+        message_id = self.messages.get(channel_id)
+        if message_id is None:
+            stored = await core.state_store.get_meta(f"mirror:{channel_id}")
+            message_id = int(stored) if stored else None
+        if message_id is not None:
+            try:
+                await channel.get_partial_message(message_id).edit(content=text)
+                self.messages[channel_id] = message_id
+                return
+            except discord.NotFound:
+                pass
+        message = await channel.send(text)
+        self.messages[channel_id] = message.id
+        core.state_store.set_meta(f"mirror:{channel_id}", str(message.id))
+
+
+async def setup(bot: commands.Bot):
+    await bot.add_cog(Mirrors(bot))
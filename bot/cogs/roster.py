@@ -0,0 +1,480 @@
+"""Roster commands, the roster messages and the gateway events that keep them current.
+
+State (statuses, rosters, edit queues, timers) lives in bot.main, so
+reloading this extension only swaps the code below. The edit scheduler,
+the status timers and the roster buttons reach it through the loaded cog.
+"""
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import discord
+from discord import app_commands
+from discord.ext import commands
+
+import bot.main as core
+from bot.logs import start_trace, trace, trace_id
+from bot.ratelimit import TokenBucket
+from bot.reactions import ReactionIndex
+from bot.roster import STATUSES, RosterModel, RosterSnapshot, paginate
+
+
+class Roster(commands.Cog):
+    def __init__(self, bot: commands.Bot):
+        self.bot = bot
+
+    @app_commands.command(name="clock_setup", description="Create the roster message here with status buttons.")
+    @app_commands.describe(name="Name for a separate roster (the server's main roster by default)")
+    @core.handler_seconds.time(handler="clock_setup")
+    async def clock_setup(self, interaction: discord.Interaction, name: Optional[app_commands.Range[str, 1, 32]] = None):
+        guild = interaction.guild
+        channel = interaction.channel
+        if guild is None or not isinstance(channel, discord.TextChannel):
+            await interaction.response.send_message("This command can only be used in a server text channel.", ephemeral=True)
+            return
+        # acknowledge first: the REST calls below can outlast the 3 second deadline
+        await interaction.response.defer(ephemeral=True, thinking=True)
+
+        rid = core.find_roster(guild.id, name)
+        #if this roster already exists, refresh it instead
+        if rid is not None and core.get_roster_message(rid) is not None:
+            core.rendered_pages.pop(rid, None)
+            await self.update_roster_message(guild, rid)
+            if rid in core.rosters:
+                await core.get_roster_message(rid).edit(view=core.roster_view)   # rosters from before the buttons
+                await interaction.followup.send("Roster message already exists; refreshed its content.", ephemeral=True)
+                return
+            # the roster message is gone; proceed to create a new one
+        if rid is None:
+            rid = interaction.id
+            core.name_roster(rid, guild.id, name)
+
+        #create the roster message
+        pages = core.roster_snapshot(guild, rid).pages
+        msg = await channel.send(core.build_roster_text(guild, rid), view=core.roster_view)
+        core.set_roster(rid, channel.id, msg.id)
+        core.roster_messages[rid] = msg
+        core.reaction_index[rid] = ReactionIndex()
+        core.rendered_pages[rid] = list(pages[:1])
+        if len(pages) > 1:
+            core.roster_edits.mark_dirty(rid)  # send the remaining pages
+        await interaction.followup.send("Roster message created.", ephemeral=True)
+
+    async def clock_status(self, interaction: discord.Interaction, status: core.Status, reply: str, roster: Optional[str]):
+        """Shared body of /clock_in, /clock_break and /clock_out.
+
+        Only in-memory state changes before the reply; the roster edit and the
+        removal of reactions that no longer match happen afterwards.
+        """
+        guild = interaction.guild
+        if guild is None:
+            await interaction.response.send_message("This command can only be used in a server.", ephemeral=True)
+            return
+        rid = core.find_roster(guild.id, roster)
+        if rid is None:
+            await interaction.response.send_message(f"There is no roster named **{roster}** here.", ephemeral=True)
+            return
+        core.set_status(rid, interaction.user.id, status)
+        await interaction.response.send_message(reply, ephemeral=True)
+        core.roster_edits.mark_dirty(rid)
+        self.drop_stale_reactions(rid, interaction.user.id, status)
+
+    @app_commands.command(name="clock_in", description="Set status: Modding (active).")
+    @app_commands.describe(roster="Named roster to clock in on (the server's main roster by default)")
+    @app_commands.autocomplete(roster=core.roster_autocomplete)
+    @core.handler_seconds.time(handler="clock_in")
+    async def clock_in(self, interaction: discord.Interaction, roster: Optional[str] = None):
+        await self.clock_status(interaction, "Modding", "You are now **Modding** ✅", roster)
+
+    @app_commands.command(name="clock_break", description="Set status: Break.")
+    @app_commands.describe(roster="Named roster to take the break on (the server's main roster by default)")
+    @app_commands.autocomplete(roster=core.roster_autocomplete)
+    @core.handler_seconds.time(handler="clock_break")
+    async def clock_break(self, interaction: discord.Interaction, roster: Optional[str] = None):
+        await self.clock_status(interaction, "Break", "You are now on **Break** ☕", roster)
+
+    @app_commands.command(name="clock_out", description="Set status: Away (unavailable).")
+    @app_commands.describe(roster="Named roster to clock out of (the server's main roster by default)")
+    @app_commands.autocomplete(roster=core.roster_autocomplete)
+    @core.handler_seconds.time(handler="clock_out")
+    async def clock_out(self, interaction: discord.Interaction, roster: Optional[str] = None):
+        await self.clock_status(interaction, "Away", "You are now **Away** 🚫", roster)
+
+    # Rendering and the roster messages. bot.main keeps the state and calls
+    # these through the loaded cog.
+
+    def render_snapshot(self, model: RosterModel, name: Optional[str] = None) -> RosterSnapshot:
+        """Render the roster pages and the topic from one read of the model.
+
+        Long name lists continue on extra lines, one per RosterModel chunk.
+        Users keep their chunk, so a status change only alters the pages
+        holding the chunks it touched. Members whose name is still being
+        looked up are counted as "(+N loading)" on every surface.
+        """
+        stamp = datetime.utcnow().strftime("%H:%M UTC")
+        lines = [f"** Mod List — {name}**" if name else "** Mod List**", "-------------------"]
+        topic = []
+        for status, label, short in core.ROSTER_LINES:
+            chunks = model.chunks(status)
+            loading = model.missing(status)
+            more = f" (+{loading} loading)" if loading else ""
+            body = chunks or ["—"]
+            lines.append(f"{label}: {body[0]}" + (more if len(body) == 1 else ""))
+            lines.extend(f"{label} (cont.): {chunk}" + (more if i == len(body) - 1 else "")
+                         for i, chunk in enumerate(body[1:], 1))
+            topic.append(f"{short}: {model.names(status) or '~'}{more}")
+        lines.append("-------------------")
+        text = f" Mod List • {' | '.join(topic)} • {stamp}"
+        if len(text) > 1024:
+            text = text[:1021] + "..."
+        return RosterSnapshot(model.version, stamp, tuple(paginate(lines, core.PAGE_LIMIT)), text)
+
+    async def update_roster_message(self, guild: discord.Guild, rid: Optional[int] = None):
+        """Update a roster's pages (the guild's default roster unless given), editing only pages whose text changed."""
+        rid = guild.id if rid is None else rid
+        msg = core.get_roster_message(rid)
+        if msg is None:
+            return
+        snap = core.roster_snapshot(guild, rid)
+        pages, stamp = snap.pages, core.stamp_line(snap)
+        shown = core.rendered_pages.setdefault(rid, [])
+        extra = list(core.roster_pages.get(rid, []))
+        channel = msg.channel
+
+        last, was_last = len(pages) - 1, len(shown) - 1
+        for i, body in enumerate(pages):
+            content = f"{body}\n{stamp}" if i == last else body
+            # a page that gains or loses the "Updated" line changes too
+            if i < len(shown) and shown[i] == body and (i == last) == (i == was_last):
+                continue
+            try:
+                if i == 0:
+                    await msg.edit(content=content)
+                elif i <= len(extra):
+                    await channel.get_partial_message(extra[i - 1]).edit(content=content)
+                else:
+                    extra.append((await channel.send(content)).id)
+            except discord.NotFound:
+                if i == 0:
+                    core.forget_roster(rid)
+                    return
+                # a page was deleted: it and the pages after it are sent again at
+                # the end on the next flush, so the later ones must go
+                await self.delete_roster_pages(rid, extra[i:])
+                del extra[i - 1:]
+                del shown[i:]
+                break
+            if i < len(shown):
+                shown[i] = body
+            else:
+                shown.append(body)
+
+        # drop pages the roster no longer needs
+        await self.delete_roster_pages(rid, extra[len(pages) - 1:])
+        del extra[len(pages) - 1:]
+        del shown[len(pages):]
+        if extra != core.roster_pages.get(rid, []):
+            core.set_roster_pages(rid, extra)
+            if len(extra) < len(pages) - 1:
+                core.roster_edits.mark_dirty(rid)
+
+    async def delete_roster_pages(self, rid: int, page_ids: List[int]):
+        """Delete page messages the roster no longer tracks; pages already gone are skipped."""
+        msg = core.get_roster_message(rid)
+        if msg is None:
+            return
+        for page_id in page_ids:
+            try:
+                await msg.channel.get_partial_message(page_id).delete()
+            except discord.NotFound:
+                pass
+
+    def drop_roster_page(self, rid: int, page_id: int):
+        """Forget a deleted page; it and the pages after it are re-sent on the next flush.
+
+        The later pages are deleted in the background so they do not linger as
+        stale copies above the re-sent ones.
+        """
+        pages = core.roster_pages[rid]
+        i = pages.index(page_id)
+        if pages[i + 1:]:
+            self.in_background(self.delete_roster_pages(rid, pages[i + 1:]))
+        core.set_roster_pages(rid, pages[:i])
+        del core.rendered_pages.get(rid, [])[i + 1:]
+        core.roster_edits.mark_dirty(rid)
+
+    @core.handler_seconds.time(handler="flush_roster")
+    async def flush_roster(self, rid: int):
+        traces = core.edit_traces.pop(rid, None)
+        guild = self.bot.get_guild(core.guild_of(rid))
+        if guild is None:
+            return
+        start = time.perf_counter()
+        if rid == guild.id:
+            for output in core.roster_outputs:
+                output(guild)
+        await self.update_roster_message(guild, rid)
+        # one entry per traced event that this edit carried
+        for tid in traces or ():
+            token = trace_id.set(tid)
+            trace("roster_edited", roster_id=rid, events=len(traces), seconds=round(time.perf_counter() - start, 4))
+            trace_id.reset(token)
+
+    @core.handler_seconds.time(handler="roster_button")
+    async def on_roster_button(self, interaction: discord.Interaction, status: core.Status):
+        """A status button was clicked: update state and edit the page in the response itself."""
+        guild = interaction.guild
+        rid = core.roster_by_message.get(interaction.message.id) if interaction.message else None
+        if guild is None or rid is None:
+            await interaction.response.send_message("This roster is no longer in use; run /clock_setup for a new one.", ephemeral=True)
+            return
+        core.set_status(rid, interaction.user.id, status)
+        pages = core.roster_snapshot(guild, rid).pages
+        shown = core.rendered_pages.setdefault(rid, [])
+        if shown and shown[0] == pages[0]:
+            await interaction.response.defer()
+        else:
+            await interaction.response.edit_message(content=core.build_roster_text(guild, rid))
+            shown[:1] = pages[:1]
+        # later pages and the channel topic follow through the edit scheduler
+        core.roster_edits.mark_dirty(rid)
+        self.drop_stale_reactions(rid, interaction.user.id, status)
+
+    # Status timers and stale reactions
+
+    def expire_statuses(self, keys: List[tuple[int, int]]):
+        """Move users whose Break or shift ran out to Away, one edit per roster.
+
+        Their status reactions are removed in the background, as fast as the
+        channel's reaction budget allows.
+        """
+        by_roster: Dict[int, List[int]] = {}
+        for rid, uid in keys:
+            # statuses shared from guilds on other processes expire there
+            if core.runs_guild(core.guild_of(rid)):
+                by_roster.setdefault(rid, []).append(uid)
+        for rid, uids in by_roster.items():
+            for uid in uids:
+                core.set_status(rid, uid, "Away")
+                self.drop_stale_reactions(rid, uid, "Away")
+            core.roster_edits.mark_dirty(rid)
+        logging.info("Expired %d statuses in %d rosters", sum(map(len, by_roster.values())), len(by_roster))
+
+    def drop_stale_reactions(self, rid: int, user_id: int, status: core.Status):
+        """Remove, in the background, the user's roster reactions for other statuses."""
+        index = core.reaction_index.get(rid)
+        if index is None or rid not in core.rosters:
+            return
+        stale = index.emojis(user_id) - {core.STATUS_EMOJIS[STATUSES.index(status)]}
+        if stale:
+            self.in_background(self.remove_reactions(rid, user_id, list(stale)))
+
+    def in_background(self, coro):
+        # kept in bot.main so a reload does not drop the running cleanups
+        task = asyncio.create_task(coro)
+        core.cleanup_tasks.add(task)
+        task.add_done_callback(core.cleanup_tasks.discard)
+
+    async def remove_reactions(self, rid: int, user_id: int, emojis: list[str]):
+        """Remove a user's reactions from the roster concurrently, within the channel's budget."""
+        msg = core.get_roster_message(rid)
+        if msg is None:
+            return
+        user = discord.Object(id=user_id)
+
+        async def remove(emo: str):
+            await core.reaction_budget.acquire(msg.channel.id)
+            start = time.perf_counter()
+            await msg.remove_reaction(emo, user)
+            trace("reaction_removed", roster_id=rid, user_id=user_id, emoji=emo,
+                  seconds=round(time.perf_counter() - start, 4))
+
+        results = await asyncio.gather(*(remove(emo) for emo in emojis), return_exceptions=True)
+        for result in results:
+            if isinstance(result, discord.NotFound):
+                # Unknown Message: the roster is gone; any other 404 (the
+                # reaction or emoji) means there was nothing left to remove
+                if result.code == 10008:
+                    core.forget_roster(rid)
+            elif isinstance(result, Exception):
+                logging.warning("Removing a reaction from roster %s failed: %s", rid, result)
+
+    # Reconciliation after a restart
+
+    async def reconcile_roster(self, rid: int, budget: TokenBucket):
+        """Rebuild a roster's reaction index and statuses from its message.
+
+        Users holding a status reaction get that status; if they hold more
+        than one (they switched while the bot was away) the status they had
+        wins, else the first in STATUS_EMOJIS order, and the rest are removed.
+        Users without a reaction keep the status they had.
+        """
+        msg = core.get_roster_message(rid)
+        if msg is None:
+            return
+        core.reconciling[rid] = []
+        try:
+            await budget.acquire()
+            try:
+                msg = await msg.fetch()
+            except discord.NotFound:
+                core.forget_roster(rid)
+                return
+            index = core.reaction_index.setdefault(rid, ReactionIndex())
+            await index.rebuild(msg, core.STATUS_EMOJIS, ignore_id=self.bot.user.id, budget=budget)
+            gmap = core.guild_user_status.get(rid, {})
+            extras: Dict[int, List[str]] = {}
+            for uid, emojis in index.users().items():
+                current = core.STATUS_EMOJIS[STATUSES.index(gmap[uid])] if uid in gmap else None
+                keep = current if current in emojis else next(e for e in core.STATUS_EMOJIS if e in emojis)
+                if gmap.get(uid) != core.emoji_to_status(keep):
+                    core.set_status(rid, uid, core.emoji_to_status(keep))
+                if len(emojis) > 1:
+                    extras[uid] = [e for e in emojis if e != keep]
+            core.roster_edits.mark_dirty(rid)
+        finally:
+            # replay what arrived while reading the message
+            for payload in core.reconciling.pop(rid, []):
+                self.bot.dispatch("raw_reaction_add" if payload.event_type == "REACTION_ADD" else "raw_reaction_remove", payload)
+        for uid, emojis in extras.items():
+            await self.remove_reactions(rid, uid, emojis)
+
+    async def reconcile_rosters(self):
+        """Reconcile the rosters of this process's guilds, RECONCILE_CONCURRENCY at a time within a shared REST budget.
+
+        Rosters of other shards (loaded from the database or the state server)
+        are left to the process running them.
+        """
+        start = time.monotonic()
+        budget = TokenBucket(core.RECONCILE_RATE, 1.0)
+        limit = asyncio.Semaphore(core.RECONCILE_CONCURRENCY)
+
+        async def one(rid: int):
+            async with limit:
+                try:
+                    await self.reconcile_roster(rid, budget)
+                except discord.HTTPException as e:
+                    logging.warning("Could not reconcile roster %s: %s", rid, e)
+
+        rids = [rid for rid in core.rosters if core.runs_guild(core.guild_of(rid))]
+        await asyncio.gather(*(one(rid) for rid in rids))
+        logging.info("Reconciled %d rosters in %.1fs", len(rids), time.monotonic() - start)
+
+    # Reactions on any message that is not a roster are dropped on the
+    # roster_by_message lookup, before timing or counting them
+
+    @commands.Cog.listener()
+    async def on_raw_reaction_add(self, payload: discord.RawReactionActionEvent):
+        rid = core.roster_by_message.get(payload.message_id)
+        if rid is not None:
+            await self.roster_reaction_add(rid, payload)
+
+    @commands.Cog.listener()
+    async def on_raw_reaction_remove(self, payload: discord.RawReactionActionEvent):
+        rid = core.roster_by_message.get(payload.message_id)
+        if rid is not None:
+            await self.roster_reaction_remove(rid, payload)
+
+    @core.handler_seconds.time(handler="on_raw_reaction_add")
+    async def roster_reaction_add(self, rid: int, payload: discord.RawReactionActionEvent):
+        core.shard_stats.record(core.shard_of(core.guild_of(rid), core.rosters.shard_count))
+        if payload.user_id == self.bot.user.id:
+            return
+        if rid in core.reconciling:
+            core.reconciling[rid].append(payload)
+            return
+
+        emoji = str(payload.emoji)
+        status = core.emoji_to_status(emoji)
+        if status is None:
+            return
+        start_trace(core.TRACE_SAMPLE)
+        trace("reaction_add", roster_id=rid, user_id=payload.user_id, emoji=emoji)
+        index = core.reaction_index.setdefault(rid, ReactionIndex())
+        index.add(payload.user_id, emoji)
+
+        # update this roster's map
+        core.set_status(rid, payload.user_id, status)
+        core.queue_roster_edit(rid)
+
+        # keep a single selection per user: the reactions they actually have
+        # for other statuses go in the background, at the channel's pace
+        self.drop_stale_reactions(rid, payload.user_id, status)
+
+    @core.handler_seconds.time(handler="on_raw_reaction_remove")
+    async def roster_reaction_remove(self, rid: int, payload: discord.RawReactionActionEvent):
+        core.shard_stats.record(core.shard_of(core.guild_of(rid), core.rosters.shard_count))
+        if payload.user_id == self.bot.user.id:
+            return
+        if rid in core.reconciling:
+            core.reconciling[rid].append(payload)
+            return
+
+        emoji = str(payload.emoji)
+        if core.emoji_to_status(emoji) is None:
+            return
+        start_trace(core.TRACE_SAMPLE)
+        trace("reaction_remove", roster_id=rid, user_id=payload.user_id, emoji=emoji)
+
+        # if user has none of the status reactions left → Away, unless the
+        # reaction was not their status any more (the bot removing a stale
+        # one after /clock_in, a button or an expiry)
+        remaining = core.reaction_index.setdefault(rid, ReactionIndex()).remove(payload.user_id, emoji)
+        current = core.guild_user_status.get(rid, {}).get(payload.user_id)
+        if not remaining and current == core.emoji_to_status(emoji):
+            core.set_status(rid, payload.user_id, "Away")
+            core.queue_roster_edit(rid)
+
+    @commands.Cog.listener()
+    async def on_raw_message_delete(self, payload: discord.RawMessageDeleteEvent):
+        rid = core.roster_by_message.get(payload.message_id)
+        if rid is not None:
+            core.forget_roster(rid)
+            return
+        for rid in core.roster_ids(payload.guild_id) if payload.guild_id else ():
+            if payload.message_id in core.roster_pages.get(rid, ()):
+                self.drop_roster_page(rid, payload.message_id)
+                return
+
+    @commands.Cog.listener()
+    async def on_raw_bulk_message_delete(self, payload: discord.RawBulkMessageDeleteEvent):
+        for message_id in payload.message_ids:
+            rid = core.roster_by_message.get(message_id)
+            if rid is not None:
+                core.forget_roster(rid)
+        for rid in core.roster_ids(payload.guild_id) if payload.guild_id else ():
+            # dropping the first deleted page re-sends every page after it
+            page_id = next((p for p in core.roster_pages.get(rid, ()) if p in payload.message_ids), None)
+            if page_id is not None:
+                self.drop_roster_page(rid, page_id)
+
+    @commands.Cog.listener()
+    async def on_member_update(self, before: discord.Member, after: discord.Member):
+        if before.display_name != after.display_name:
+            core.refresh_name(after.guild.id, after.id, after.display_name)
+
+    @commands.Cog.listener()
+    async def on_user_update(self, before: discord.User, after: discord.User):
+        # global display name changes show up in every guild without a nickname
+        if before.display_name == after.display_name:
+            return
+        gids = {core.guild_of(rid) for rid, gmap in core.guild_user_status.items() if after.id in gmap}
+        for gid in gids:
+            guild = self.bot.get_guild(gid)
+            member = guild.get_member(after.id) if guild else None
+            if member is not None:
+                core.refresh_name(gid, after.id, member.display_name)
+
+    @commands.Cog.listener()
+    async def on_member_join(self, member: discord.Member):
+        core.refresh_name(member.guild.id, member.id, member.display_name)
+
+    @commands.Cog.listener()
+    async def on_raw_member_remove(self, payload: discord.RawMemberRemoveEvent):
+        core.refresh_name(payload.guild_id, payload.user.id, None)
+
+
+async def setup(bot: commands.Bot):
+    await bot.add_cog(Roster(bot))
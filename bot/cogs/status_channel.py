@@ -0,0 +1,75 @@
+"""The status channel: a text channel whose topic mirrors the roster.
+
+Each guild picks its own channel with /clock_setchannel. The choice is
+kept in the state store (meta key "status_channel:<guild id>") and read
+back the first time the guild's roster is published after a start; it is
+also handed over to the new code on reload. The topic queue itself
+(core.topic_publisher) lives in bot.main.
+"""
+import asyncio
+from typing import Dict, Optional, Set
+
+import discord
+from discord import app_commands
+from discord.ext import commands
+
+import bot.main as core
+from bot.logs import untraced_task
+
+
+def meta_key(guild_id: int) -> str:
+    return f"status_channel:{guild_id}"
+
+
+class StatusChannel(commands.Cog):
+    def __init__(self, bot: commands.Bot):
+        self.bot = bot
+        state = core.take_handover(self.qualified_name)
+        self.channels: Dict[int, Optional[int]] = state.get("channels", {})   # guild id -> channel id, None = unset
+        self.loading: Set[asyncio.Task] = set()
+
+    async def cog_load(self):
+        core.roster_outputs.append(self.publish)
+
+    async def cog_unload(self):
+        core.roster_outputs.remove(self.publish)
+        for task in self.loading:
+            task.cancel()
+        core.handover[self.qualified_name] = {"channels": self.channels}
+
+    def publish(self, guild: discord.Guild):
+        if guild.id not in self.channels:
+            task = untraced_task(self.load(guild))
+            self.loading.add(task)
+            task.add_done_callback(self.loading.discard)
+            return
+        channel_id = self.channels[guild.id]
+        channel = guild.get_channel(channel_id) if channel_id is not None else None
+        if not isinstance(channel, discord.TextChannel):
+            return
+        core.topic_publisher.submit(channel, core.roster_snapshot(guild).topic)
+
+    async def load(self, guild: discord.Guild):
+        stored = await core.state_store.get_meta(meta_key(guild.id))
+        if guild.id not in self.channels:   # /clock_setchannel may have run meanwhile
+            self.channels[guild.id] = int(stored) if stored else None
+            self.publish(guild)
+
+    @app_commands.command(name="clock_setchannel", description="Choose the channel that shows the clock roster in its topic.")
+    @app_commands.default_permissions(manage_channels=True)
+    @app_commands.guild_only()
+    async def clock_setchannel(self, interaction: discord.Interaction, channel: discord.TextChannel):
+        # Needs Manage Channels in that channel
+        perms = channel.permissions_for(channel.guild.me)
+        if not perms.manage_channels:
+            await interaction.response.send_message("I need **Manage Channels** in that channel.", ephemeral=True)
+            return
+
+        self.channels[channel.guild.id] = channel.id
+        core.state_store.set_meta(meta_key(channel.guild.id), str(channel.id))
+        self.publish(channel.guild)
+        await interaction.response.send_message(f"Clock channel set to #{channel.name}.", ephemeral=True)
+
+
+async def setup(bot: commands.Bot):
+    await bot.add_cog(StatusChannel(bot))
@@ -0,0 +1,119 @@
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Dict, Set
+
+from bot.logs import untraced_task
+from bot.shards import shard_of
+
+
+class EditScheduler:
+    """Coalesce roster edits so each guild gets at most one edit per window.
+
+    mark_dirty() never awaits. The first mark starts a flush task for the
+    guild which waits until no new mark arrived for `window` seconds (or
+    `max_latency` seconds passed since the first mark) and then calls
+    flush(guild_id) once. There is only ever one task per guild, so edits
+    for a guild go out one at a time and in order.
+    """
+
+    def __init__(self, flush: Callable[[int], Awaitable[None]], window: float = 1.5, max_latency: float = 5.0):
+        self.flush = flush
+        self.window = window
+        self.max_latency = max_latency
+        self._first: Dict[int, float] = {}    # guild -> time of first unflushed mark
+        self._last: Dict[int, float] = {}     # guild -> time of latest mark
+        self._tasks: Dict[int, asyncio.Task] = {}
+        self._flushing: Set[int] = set()
+        self._closing = False
+
+    def mark_dirty(self, guild_id: int):
+        now = time.monotonic()
+        self._first.setdefault(guild_id, now)
+        self._last[guild_id] = now
+        if guild_id not in self._tasks and not self._closing:
+            self._tasks[guild_id] = untraced_task(self._run(guild_id))
+
+    def pending(self) -> int:
+        """Number of guilds waiting for a flush."""
+        return len(self._first)
+
+    def active(self) -> int:
+        """Number of guilds with a flush waiting or in flight."""
+        return len(self._tasks)
+
+    async def _run(self, guild_id: int):
+        try:
+            while guild_id in self._first:
+                deadline = min(self._last[guild_id] + self.window,
+                               self._first[guild_id] + self.max_latency)
+                delay = deadline - time.monotonic()
+                if delay > 0 and not self._closing:
+                    await asyncio.sleep(delay)
+                    continue
+                await self._flush(guild_id)
+        finally:
+            self._tasks.pop(guild_id, None)
+
+    async def _flush(self, guild_id: int):
+        # marks that arrive while the edit is in flight start a new window
+        self._first.pop(guild_id, None)
+        self._last.pop(guild_id, None)
+        self._flushing.add(guild_id)
+        try:
+            await self.flush(guild_id)
+        except Exception:
+            logging.exception("Roster flush failed for guild %s", guild_id)
+        finally:
+            self._flushing.discard(guild_id)
+
+    async def close(self):
+        """Flush every dirty guild right away. Used on shutdown."""
+        self._closing = True
+        tasks = list(self._tasks.items())
+        for gid, task in tasks:
+            if gid not in self._flushing:
+                task.cancel()
+        await asyncio.gather(*(t for _, t in tasks), return_exceptions=True)
+        for gid in list(self._first):
+            await self._flush(gid)
+
+
+class ShardedEditScheduler:
+    """One EditScheduler per shard, picked by the guild's shard.
+
+    Keys that are not guild ids are placed by the guild guild_of(key) returns.
+    """
+
+    def __init__(self, flush: Callable[[int], Awaitable[None]], shard_count: int = 1,
+                 window: float = 1.5, max_latency: float = 5.0, guild_of: Callable[[int], int] = int):
+        self.flush = flush
+        self.guild_of = guild_of
+        self.window = window
+        self.max_latency = max_latency
+        self.shards = [EditScheduler(flush, window, max_latency) for _ in range(shard_count)]
+
+    def for_guild(self, guild_id: int) -> EditScheduler:
+        return self.shards[shard_of(self.guild_of(guild_id), len(self.shards))]
+
+    def mark_dirty(self, guild_id: int):
+        self.for_guild(guild_id).mark_dirty(guild_id)
+
+    def pending(self) -> int:
+        return sum(s.pending() for s in self.shards)
+
+    def active(self) -> int:
+        return sum(s.active() for s in self.shards)
+
+    async def reshard(self, shard_count: int):
+        """Switch to a new shard count, flushing whatever the old queues held."""
+        if shard_count == len(self.shards):
+            return
+        old, self.shards = self.shards, [EditScheduler(self.flush, self.window, self.max_latency)
+                                         for _ in range(shard_count)]
+        for scheduler in old:
+            await scheduler.close()
+
+    async def close(self):
+        for scheduler in self.shards:
+            await scheduler.close()
@@ -0,0 +1,94 @@
+import asyncio
+import atexit
+import contextvars
+import itertools
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+from datetime import datetime, timezone
+from typing import Coroutine, Optional
+
+# Correlation id of the sampled event being handled in this context, if any.
+# asyncio tasks copy the context they are created in, so work an event
+# spawns carries the id along.
+trace_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("trace_id", default=None)
+
+_trace_ids = itertools.count(1)
+_prefix = f"{os.getpid():x}"
+_log = logging.getLogger("sybot.trace")
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message, trace id and extras."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        if getattr(record, "trace_id", None):
+            entry["trace_id"] = record.trace_id
+        if getattr(record, "fields", None):
+            entry.update(record.fields)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """Hands records to the listener thread with only cheap work done here.
+
+    The message is merged with its args and exceptions are rendered to text
+    (the traceback cannot cross threads), but formatting is left to the
+    listener's handler.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        record.trace_id = trace_id.get()
+        return record
+
+
+def setup_logging(level: int = logging.INFO, as_json: bool = True) -> logging.handlers.QueueListener:
+    """Route all logging through a queue to a background thread that writes stderr."""
+    records: queue.SimpleQueue = queue.SimpleQueue()
+    output = logging.StreamHandler()
+    output.setFormatter(JsonFormatter() if as_json else logging.Formatter(
+        "%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    listener = logging.handlers.QueueListener(records, output, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    root = logging.getLogger()
+    root.handlers[:] = [_QueueHandler(records)]
+    root.setLevel(level)
+    return listener
+
+
+def start_trace(sample: float) -> Optional[str]:
+    """Give the current context a correlation id with probability `sample`."""
+    if sample <= 0 or random.random() >= sample:
+        return None
+    tid = f"{_prefix}-{next(_trace_ids)}"
+    trace_id.set(tid)
+    return tid
+
+
+def trace(event: str, **fields):
+    """Log a step of the traced event handled in this context; no-op otherwise."""
+    if trace_id.get() is not None:
+        _log.info(event, extra={"fields": fields})
+
+
+def untraced_task(coro: Coroutine) -> asyncio.Task:
+    """create_task for long-lived workers: the task starts in an empty context,
+    so it does not carry the trace id of the event that happened to start it."""
+    return contextvars.Context().run(asyncio.create_task, coro)
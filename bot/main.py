@@ -1,11 +1,35 @@
 import os
+import sys
+import json
+import time
+import signal
+import hashlib
+import asyncio
 import logging
 import discord
 from discord.ext import commands
 from discord import app_commands
 from dotenv import load_dotenv
-from datetime import datetime
-
+from typing import Callable, Dict, List, Literal, Optional, Set, Union
+
+from bot.backend import SocketBackend, StateBackend
+from bot.edits import ShardedEditScheduler
+from bot.logs import setup_logging, trace_id
+from bot.metrics import Gauge, Histogram, Registry, instrument_http
+from bot.names import NameCache
+from bot.ratelimit import RouteBudget
+from bot.reactions import ReactionIndex
+from bot.roster import RosterModel, RosterSnapshot
+from bot.shards import ShardedDict, ShardStats, shard_of
+from bot.stats import WINDOWS, ShiftStats
+from bot.store import StateStore
+from bot.timers import DeadlineScheduler
+from bot.topics import TopicPublisher
+from bot.views import RosterView
+
+# `python -m bot.main` runs this file as __main__; register it under its package
+# name as well so extensions importing bot.main get this module, not a second copy
+sys.modules.setdefault("bot.main", sys.modules[__name__])
 
 load_dotenv()
 TOKEN = os.getenv('DISCORD_TOKEN')
@@ -15,164 +39,463 @@ if guild_id:
 else:
     GUILD_ID = None
 
+# Sharding: SHARDED=1 runs an AutoShardedBot. SHARD_COUNT fixes the number of
+# shards (otherwise Discord recommends one) and SHARD_IDS picks which of them
+# this process runs, e.g. "0,1".
+SHARD_COUNT = int(os.getenv("SHARD_COUNT", "0")) or None
+SHARD_IDS = [int(s) for s in os.getenv("SHARD_IDS", "").split(",") if s.strip()] or None
+SHARDED = os.getenv("SHARDED") == "1" or SHARD_COUNT is not None
+
+# Roster edits are coalesced: one edit per guild once reactions settle for
+# ROSTER_EDIT_WINDOW seconds, and never later than ROSTER_EDIT_MAX_LATENCY.
+ROSTER_EDIT_WINDOW = float(os.getenv("ROSTER_EDIT_WINDOW", "1.5"))
+ROSTER_EDIT_MAX_LATENCY = float(os.getenv("ROSTER_EDIT_MAX_LATENCY", "5"))
+
+# Statuses and rosters survive restarts in this SQLite file
+STATE_DB = os.getenv("STATE_DB", "sybot.db")
+STATE_FLUSH_INTERVAL = float(os.getenv("STATE_FLUSH_INTERVAL", "1"))
+
+# Low-memory profile: no member or message cache and no chunking; display names
+# of rostered users come from a bounded LRU (NAME_CACHE_SIZE users, refreshed
+# after NAME_CACHE_TTL seconds) filled by batched member fetches.
+LOW_MEMORY = os.getenv("LOW_MEMORY") == "1"
+NAME_CACHE_SIZE = int(os.getenv("NAME_CACHE_SIZE", "5000"))
+NAME_CACHE_TTL = float(os.getenv("NAME_CACHE_TTL", "3600"))
+
+# Several bot processes can share statuses and rosters through a state server
+# (python -m bot.stateserver) listening on this Unix socket
+STATE_SOCKET = os.getenv("STATE_SOCKET")
+
+# Extensions from bot/cogs loaded at startup, comma separated
+EXTENSIONS = [e.strip() for e in os.getenv("EXTENSIONS", "roster,status_channel,mirrors,commands").split(",") if e.strip()]
+
+# Read-only copies of a guild's roster in channels of other guilds, as
+# comma separated source_guild_id:channel_id pairs (see bot/cogs/mirrors.py)
+ROSTER_MIRRORS: Dict[int, List[int]] = {}
+for _pair in filter(None, (p.strip() for p in os.getenv("ROSTER_MIRRORS", "").split(","))):
+    _gid, _cid = _pair.split(":")
+    ROSTER_MIRRORS.setdefault(int(_gid), []).append(int(_cid))
+
+# The command tree is only synced when it changed since the last sync;
+# FORCE_TREE_SYNC=1 syncs on every ready
+FORCE_TREE_SYNC = os.getenv("FORCE_TREE_SYNC") == "1"
+
+# Statuses that fall back to Away on their own: Break after BREAK_TIMEOUT
+# minutes and Modding after SHIFT_LIMIT minutes (0 turns either off)
+BREAK_TIMEOUT = float(os.getenv("BREAK_TIMEOUT", "0"))
+SHIFT_LIMIT = float(os.getenv("SHIFT_LIMIT", "0"))
+
+# Startup reconciliation reads RECONCILE_CONCURRENCY rosters at a time and makes
+# at most RECONCILE_RATE REST calls per second while doing it
+RECONCILE_CONCURRENCY = int(os.getenv("RECONCILE_CONCURRENCY", "16"))
+RECONCILE_RATE = float(os.getenv("RECONCILE_RATE", "25"))
+
+# Logs are written from a background thread, as JSON lines unless LOG_FORMAT=text.
+# TRACE_SAMPLE (0-1) is the share of roster reaction events logged step by step
+# under one trace_id: the event, its reaction removals and the roster edit.
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+TRACE_SAMPLE = float(os.getenv("TRACE_SAMPLE", "0"))
+
+# Prometheus metrics are served on METRICS_HOST:METRICS_PORT/metrics when a port is set
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+
 intents = discord.Intents.default()
 intents.guilds = True
 intents.messages = True       # Needed for edit meessages
 intents.reactions = True       # Needed for reaction events
-
-bot = commands.Bot(command_prefix='!', intents=intents)
+# Privileged: lets nickname changes and leaves reach the roster right away
+intents.members = os.getenv("MEMBERS_INTENT") == "1"
+
+class RosterBot(commands.AutoShardedBot if SHARDED else commands.Bot):
+    _held_events: Optional[List[tuple]] = None
+
+    @property
+    def reloading(self) -> bool:
+        return self._held_events is not None
+
+    def dispatch(self, event_name: str, /, *args, **kwargs):
+        # while extensions are swapped, events wait here instead of finding no listener
+        if self._held_events is not None:
+            self._held_events.append((event_name, args, kwargs))
+            return
+        super().dispatch(event_name, *args, **kwargs)
+
+    async def reload_extensions(self, names: List[str]):
+        """Reload extensions with gateway events held back until the new code is in."""
+        self._held_events = []
+        try:
+            for name in names:
+                await self.reload_extension(name)
+        finally:
+            held, self._held_events = self._held_events, None
+            for event_name, args, kwargs in held:
+                super().dispatch(event_name, *args, **kwargs)
+
+    async def setup_hook(self):
+        await load_extensions()
+        state_store.start()
+        await state_backend.start(guild_user_status, rosters, named_rosters)
+        global roster_view
+        roster_view = RosterView(on_roster_button)
+        self.add_view(roster_view)   # keeps buttons on existing rosters working
+        instrument_http(self.http, rest_seconds)
+        if METRICS_PORT:
+            await metrics.serve(METRICS_HOST, METRICS_PORT)
+
+    async def close(self):
+        # push out any pending roster edits while the HTTP session is still open
+        await roster_edits.close()
+        await super().close()
+        await status_timers.close()
+        await state_backend.close()
+        await state_store.close()
+        await metrics.close()
+
+bot_options = {}
+if SHARDED:
+    bot_options.update(shard_count=SHARD_COUNT, shard_ids=SHARD_IDS)
+if LOW_MEMORY:
+    bot_options.update(member_cache_flags=discord.MemberCacheFlags.none(),
+                       chunk_guilds_at_startup=False, max_messages=None)
+
+bot = RosterBot(command_prefix='!', intents=intents, **bot_options)
+
+# === metrics ===
+
+metrics = Registry()
+handler_seconds = metrics.add(Histogram("sybot_handler_seconds", "Time spent in event handlers, commands and roster flushes"))
+rest_seconds = metrics.add(Histogram("sybot_rest_seconds", "Discord REST call duration by route"))
+
+def gateway_latency():
+    if SHARDED:
+        return {(("shard", str(sid)),): latency for sid, latency in bot.latencies}
+    return bot.latency
+
+metrics.add(Gauge("sybot_gateway_latency_seconds", "Gateway heartbeat latency", gateway_latency))
+metrics.add(Gauge("sybot_pending_roster_edits", "Rosters waiting for an edit", lambda: roster_edits.pending()))
+metrics.add(Gauge("sybot_pending_topics", "Channels waiting for a topic edit", lambda: topic_publisher.pending()))
+metrics.add(Gauge("sybot_pending_state_writes", "State changes not yet written to the database", lambda: state_store.pending()))
+metrics.add(Gauge("sybot_status_timers", "Statuses waiting to expire", lambda: len(status_timers)))
+metrics.add(Gauge("sybot_topic_edits_total", "Topic edits sent or dropped as superseded",
+                  lambda: {(("result", "published"),): topic_publisher.published,
+                           (("result", "suppressed"),): topic_publisher.suppressed}, kind="counter"))
+metrics.add(Gauge("sybot_reaction_events_total", "Reaction events on roster messages received per shard",
+                  lambda: {(("shard", str(sid)),): n for sid, n in shard_stats.totals.items()}, kind="counter"))
 
 # === mod list data storage ===
 
-from typing import Dict, Literal, Optional
 
 Status = Literal["Modding", "Break", "Away"]
 
-# For every guild (server), store its users' statuses
-guild_user_status: Dict[int, Dict[int, Status]] = {}
+# Roster state is keyed by roster id: a guild's default roster uses the guild
+# id, a named roster (/clock_setup name:...) the id of the interaction that
+# created it. Names are never reused for another id, so a roster whose
+# message was deleted keeps its statuses for the next /clock_setup.
+named_rosters: Dict[int, tuple[int, str]] = {}       # roster id -> (guild id, name)
+guild_roster_names: Dict[int, Dict[str, int]] = {}   # guild id -> name -> roster id
+
+def guild_of(rid: int) -> int:
+    owner = named_rosters.get(rid)
+    return owner[0] if owner is not None else rid
+
+def roster_name(rid: int) -> Optional[str]:
+    owner = named_rosters.get(rid)
+    return owner[1] if owner is not None else None
+
+def roster_ids(gid: int) -> List[int]:
+    """The guild's default roster id followed by those of its named rosters."""
+    return [gid, *guild_roster_names.get(gid, {}).values()]
+
+def find_roster(gid: int, name: Optional[str]) -> Optional[int]:
+    """Roster id for a name given in a command (None/"" is the default roster)."""
+    return guild_roster_names.get(gid, {}).get(name) if name else gid
+
+def register_roster_name(rid: int, gid: int, name: str):
+    named_rosters[rid] = (gid, name)
+    guild_roster_names.setdefault(gid, {})[name] = rid
+
+def name_roster(rid: int, gid: int, name: str):
+    register_roster_name(rid, gid, name)
+    state_store.name_roster(rid, gid, name)
+    state_backend.name_roster(rid, gid, name)
+
+async def roster_autocomplete(interaction: discord.Interaction, current: str) -> List[app_commands.Choice[str]]:
+    names = guild_roster_names.get(interaction.guild_id, {})
+    return [app_commands.Choice(name=name, value=name)
+            for name in sorted(names) if current.lower() in name.lower()][:25]
+
+# For every roster, store its users' statuses
+# (partitioned by shard; until the shard count is known everything is in one part)
+guild_user_status: ShardedDict[Dict[int, Status]] = ShardedDict(SHARD_COUNT or 1, guild_of=guild_of)
 
-status_channel_id: Optional[int] = None
 
 # Emojis used for status selection
 EMO_ACTIVE = "🟢"   # or "✅"
 EMO_BREAK  = "☕"
 EMO_AWAY   = "⛔"
 
-# For every guild, store the channel ID and message ID of its roster message
-rosters: Dict[int, tuple[int, int]] = {}
+# For every roster, store the channel ID and message ID of its roster message
+rosters: ShardedDict[tuple[int, int]] = ShardedDict(SHARD_COUNT or 1, guild_of=guild_of)
+
+# Roster message id -> roster id. Raw reaction events for any other message
+# are dropped after this one lookup.
+roster_by_message: Dict[int, int] = {}
+
+# Extra messages (pages 2..n) of each roster, in order
+roster_pages: Dict[int, List[int]] = {}
+
+# For every roster, which status emoji each user has on it
+reaction_index: Dict[int, ReactionIndex] = {}
+
+STATUS_EMOJIS = (EMO_ACTIVE, EMO_BREAK, EMO_AWAY)
+
+# Modding/Break time per user over rolling windows, for /clock_stats
+shift_stats = ShiftStats()
 
-def build_topic(guild: discord.Guild) -> str:
-    gmap = guild_user_status.get(guild.id, {})
-    modding, active, away = [], [], []
-    for user_id, status in gmap.items():
-        member = guild.get_member(user_id)
-        if not member:
+# Discord lets a channel take about one reaction change per 0.25s
+reaction_budget = RouteBudget(rate=4, per=1.0)
+
+# transitions are kept as long as the longest /clock_stats window needs them
+state_store = StateStore(STATE_DB, flush_interval=STATE_FLUSH_INTERVAL, keep_transitions=max(WINDOWS.values()))
+
+# For every roster, its statuses bucketed for rendering (built on first render)
+roster_models: Dict[int, RosterModel] = {}
+
+def on_names_resolved(gid: int, names: Dict[int, Optional[str]]):
+    for rid in roster_ids(gid):
+        model = roster_models.get(rid)
+        if model is None:
             continue
-        name = member.display_name
-        if status == "Modding":
-            modding.append(name)
-        elif status == "Break":
-            active.append(name)
-        else:
-            away.append(name)
-    a = ", ".join(modding) if modding else "~"
-    b = ", ".join(active) if active else "~"
-    c = ", ".join(away) if away else "~"
-    stamp = datetime.utcnow().strftime("%H:%M UTC")
-    text = f" Mod List • 🟢Modding: {a} | ☕Break: {b} | ⛔Away: {c} • {stamp}"
-    return text[:1021] + "..." if len(text) > 1024 else text
-
-def build_roster_text(guild: discord.Guild) -> str:
-    gmap = guild_user_status.get(guild.id, {})
-    modding, on_break, away = [], [], []
-    for uid, status in gmap.items():
-        member = guild.get_member(uid)
-        name = member.display_name if member else f"<@{uid}>"
-        if status == "Modding":
-            modding.append(name)
-        elif status == "Break":
-            on_break.append(name)
-        else:
-            away.append(name)
-    a = ", ".join(modding) if modding else "—"
-    b = ", ".join(on_break) if on_break else "—"
-    c = ", ".join(away) if away else "—"
-    stamp = datetime.utcnow().strftime("%H:%M UTC")
-    return (
-        f"** Mod List**\n"
-        f"-------------------\n"
-        f"🟢 Modding: {a}\n"
-        f"☕ Break: {b}\n"
-        f"⛔ Away: {c}\n"
-        f"-------------------\n"
-        f"*Updated {stamp}*"
-    )
-    
-#async def get_roster_message(guild: discord.Guild) -> Optional[discord.Message]:
-#    if roster_channel_id is None or roster_message_id is None:
-#        return None
-#    channel = guild.get_channel(roster_channel_id)
-#    if not isinstance(channel, discord.TextChannel):
-#        return None
-#    try:
-#        return await channel.fetch_message(roster_message_id)
-#    except discord.NotFound:
-#        return None
-
-async def update_roster_message(guild: discord.Guild):
-
-    """Update the roster message in the guild."""
-    # Make sure this guild actually has a roster message recorded
-    if guild_id not in rosters:
+        changed = False
+        for uid, name in names.items():
+            changed |= model.rename(uid, name if name is not None else f"<@{uid}>")
+        if changed:
+            roster_edits.mark_dirty(rid)
+
+# Display names of rostered users, filled lazily in batches
+if LOW_MEMORY:
+    name_cache = NameCache(on_names_resolved, max_size=NAME_CACHE_SIZE, ttl=NAME_CACHE_TTL)
+else:
+    name_cache = NameCache(on_names_resolved)
+
+def display_name(guild: Optional[discord.Guild], uid: int) -> Optional[str]:
+    """The user's display name, a mention if they are not in the guild, or None while the lookup runs."""
+    name = name_cache.get(guild, uid) if guild else None
+    if name is None and (guild is None or name_cache.absent(guild.id, uid)):
+        return f"<@{uid}>"
+    return name
+
+def refresh_name(gid: int, uid: int, name: Optional[str]):
+    """Apply a member's new display name (None if they left) to the guild's rosters."""
+    rids = [rid for rid in roster_ids(gid) if uid in guild_user_status.get(rid, {})]
+    if not rids:
+        return
+    if name is None:
+        name_cache.forget(gid, uid)
+    else:
+        name_cache.update(gid, uid, name)
+    for rid in rids:
+        model = roster_models.get(rid)
+        if model is not None and model.rename(uid, name if name is not None else f"<@{uid}>"):
+            roster_edits.mark_dirty(rid)
+
+def get_roster_model(guild: discord.Guild, rid: int) -> RosterModel:
+    model = roster_models.get(rid)
+    if model is None:
+        model = roster_models[rid] = RosterModel(chunk_limit=PAGE_LIMIT - 100)
+        for uid, status in guild_user_status.get(rid, {}).items():
+            model.set(uid, status, display_name(guild, uid))
+    return model
+
+def set_status(rid: int, user_id: int, status: Status):
+    apply_status(rid, user_id, status)
+    state_backend.set_status(rid, user_id, status)
+
+def apply_status(rid: int, user_id: int, status: Status):
+    guild_user_status.setdefault(rid, {})[user_id] = status
+    state_store.set_status(rid, user_id, status)
+    at = time.time()
+    if shift_stats.transition(rid, user_id, status, at):
+        state_store.record_transition(rid, user_id, status, at)
+    schedule_expiry(rid, user_id, status, at)
+    model = roster_models.get(rid)
+    if model is not None:
+        model.set(user_id, status, display_name(bot.get_guild(guild_of(rid)), user_id))
+
+def schedule_expiry(rid: int, user_id: int, status: Status, since: float):
+    """(Re)start the user's expiry timer for the status, or cancel it."""
+    limit = {"Break": BREAK_TIMEOUT, "Modding": SHIFT_LIMIT}.get(status, 0)
+    if limit:
+        status_timers.schedule((rid, user_id), since + limit * 60)
+    else:
+        status_timers.cancel((rid, user_id))
+
+# Reaction and page cleanup running in the background
+cleanup_tasks: Set[asyncio.Task] = set()
+
+# Roster behaviour lives in the Roster cog (bot/cogs/roster.py) so /clock_reload
+# can replace it. The timers, edit scheduler and status buttons are created
+# once, here, with the callbacks below that forward to the loaded cog. While
+# the cog is being swapped, their work is put off instead of dropped.
+
+def roster_cog():
+    cog = bot.get_cog("Roster")
+    if cog is None:
+        raise RuntimeError("The roster extension is not loaded")
+    return cog
+
+def expire_statuses(keys: List[tuple[int, int]]):
+    cog = bot.get_cog("Roster")
+    if cog is not None:
+        cog.expire_statuses(keys)
+    elif bot.reloading:
+        for key in keys:
+            status_timers.schedule(key, time.time() + 1)
+
+status_timers = DeadlineScheduler(expire_statuses)
+
+def runs_guild(gid: int) -> bool:
+    """Whether the guild is on a shard this process runs (known once ready)."""
+    return bot.get_guild(gid) is not None
+
+def set_roster(rid: int, channel_id: int, message_id: int):
+    old = rosters.get(rid)
+    if old is not None:
+        roster_by_message.pop(old[1], None)
+    rosters[rid] = (channel_id, message_id)
+    roster_by_message[message_id] = rid
+    state_store.set_roster(rid, channel_id, message_id)
+    state_backend.set_roster(rid, (channel_id, message_id))
+
+# Discord allows 2000 characters per message; keep room for the "Updated" line
+PAGE_LIMIT = 1900
+ROSTER_LINES = (("Modding", "🟢 Modding", "🟢Modding"), ("Break", "☕ Break", "☕Break"), ("Away", "⛔ Away", "⛔Away"))
+
+# Latest snapshot per roster, replaced when the roster's RosterModel changes
+snapshots: Dict[int, RosterSnapshot] = {}
+
+def roster_snapshot(guild: discord.Guild, rid: Optional[int] = None) -> RosterSnapshot:
+    """What every surface of a roster (the guild's default one unless given) shows, rendered once per change."""
+    rid = guild.id if rid is None else rid
+    model = get_roster_model(guild, rid)
+    snap = snapshots.get(rid)
+    if snap is None or snap.version != model.version:
+        snap = snapshots[rid] = roster_cog().render_snapshot(model, roster_name(rid))
+    return snap
+
+def stamp_line(snap: RosterSnapshot) -> str:
+    return f"*Updated {snap.stamp}*"
+
+def build_roster_text(guild: discord.Guild, rid: Optional[int] = None) -> str:
+    """First roster page, stamped when it is the only one."""
+    snap = roster_snapshot(guild, rid)
+    return snap.pages[0] if len(snap.pages) > 1 else f"{snap.pages[0]}\n{stamp_line(snap)}"
+
+# Cached handles for roster messages. A PartialMessage is enough to edit the
+# message and manage its reactions, so the hot path never has to fetch it.
+roster_messages: Dict[int, Union[discord.Message, discord.PartialMessage]] = {}
+
+def get_roster_message(rid: int) -> Optional[Union[discord.Message, discord.PartialMessage]]:
+    msg = roster_messages.get(rid)
+    if msg is None and rid in rosters:
+        chan_id, msg_id = rosters[rid]
+        msg = bot.get_partial_messageable(chan_id, guild_id=guild_of(rid)).get_partial_message(msg_id)
+        roster_messages[rid] = msg
+    return msg
+
+def forget_roster(rid: int):
+    """Drop a roster whose message is gone."""
+    drop_roster_state(rid)
+    state_backend.set_roster(rid, None)
+
+def drop_roster_state(rid: int):
+    loc = rosters.pop(rid, None)
+    if loc is not None:
+        roster_by_message.pop(loc[1], None)
+    state_store.delete_roster(rid)
+    roster_messages.pop(rid, None)
+    roster_pages.pop(rid, None)
+    rendered_pages.pop(rid, None)
+    reaction_index.pop(rid, None)
+
+# Changes made by other bot processes, through the shared state backend
+
+def on_shared_status(rid: int, user_id: int, status: Status):
+    if guild_user_status.get(rid, {}).get(user_id) == status:
         return
-    
-    #unpack the channel and message IDs for this guild
-    chan_id, msg_id = rosters[guild.id]
+    apply_status(rid, user_id, status)
+    if rid in rosters:
+        roster_edits.mark_dirty(rid)
 
-    #get the channel and message objects
-    channel = guild.get_channel(chan_id)
-    if not isinstance(channel, discord.TextChannel):
+def on_shared_roster(rid: int, loc: Optional[tuple[int, int]]):
+    if rosters.get(rid) == loc:
         return
-    try:
-        msg = await channel.fetch_message(msg_id)
-    except discord.NotFound:
+    drop_roster_state(rid)
+    if loc is not None:
+        rosters[rid] = loc
+        roster_by_message[loc[1]] = rid
+        state_store.set_roster(rid, *loc)
+        reaction_index[rid] = ReactionIndex()
+
+def on_shared_name(rid: int, gid: int, name: str):
+    if rid in named_rosters:
         return
-    #edit the message content
-    await msg.edit(content=build_roster_text(guild))
+    register_roster_name(rid, gid, name)
+    state_store.name_roster(rid, gid, name)
 
+state_backend = SocketBackend(STATE_SOCKET) if STATE_SOCKET else StateBackend()
+state_backend.on_status = on_shared_status
+state_backend.on_roster = on_shared_roster
+state_backend.on_name = on_shared_name
 
-async def update_status_channel(guild: discord.Guild):
-    if status_channel_id is None:
-        return
-    channel = guild.get_channel(status_channel_id)
-    if not isinstance(channel, discord.TextChannel):
-        return
-    text = build_topic(guild)
-    await channel.edit(topic=text, reason="Updating modding status")
+def set_roster_pages(rid: int, page_ids: List[int]):
+    roster_pages[rid] = page_ids
+    state_store.set_roster_pages(rid, page_ids)
 
+# What each roster page last showed (without the "Updated" line)
+rendered_pages: Dict[int, List[str]] = {}
 
-@bot.tree.command(name="clock_setup", description="Create the roster message here and add reaction controls.")
-async def clock_setup(interaction: discord.Interaction):
-    guild = interaction.guild
-    channel = interaction.channel
-    if guild is None or not isinstance(channel, discord.TextChannel):
-        await interaction.response.send_message("This command can only be used in a server text channel.", ephemeral=True)
-        return
-    
-    #if roster already exists for this guild, refresh it instead
-    if guild.id in rosters:
-        chan_id, msg_id = rosters[guild.id]
-        ch = guild.get_channel(chan_id)
-        try:
-            if isinstance(ch, discord.TextChannel):
-                msg = await ch.fetch_message(msg_id)
-                await msg.edit(content=build_roster_text(guild))
-                await interaction.response.send_message("Roster message already exists; refreshed its content.", ephemeral=True)
-                return
-        except discord.NotFound:
-            pass  # proceed to create a new roster message
+# Topic edits are limited to 2 per 10 minutes per channel; only the newest topic is sent
+topic_publisher = TopicPublisher(rate=2, per=600)
+
+# Other surfaces that follow the guild's default roster (the status channel
+# topic, mirrors); extensions add a callable here that flush_roster calls
+# with the guild
+roster_outputs: List[Callable[[discord.Guild], None]] = []
 
-    #create the roster message
-    content = build_roster_text(guild)
-    msg = await channel.send(content)
-    rosters[guild.id] = (channel.id, msg.id)
 
-    #add reaction controls
-    for emo in (EMO_ACTIVE, EMO_BREAK, EMO_AWAY):
-        await msg.add_reaction(emo)
-    await interaction.response.send_message("Roster message created and controls added.", ephemeral=True)
+async def flush_roster(rid: int):
+    cog = bot.get_cog("Roster")
+    if cog is not None:
+        await cog.flush_roster(rid)
+    elif bot.reloading:
+        roster_edits.mark_dirty(rid)   # try again after the window
 
+# Correlation ids of sampled events waiting for their roster's edit
+edit_traces: Dict[int, List[str]] = {}
 
-    # Save where it lives (module vars)
-    global roster_channel_id, roster_message_id
-    roster_channel_id = channel.id
-    roster_message_id = msg.id
+def queue_roster_edit(rid: int):
+    """mark_dirty for event handlers: a traced event also follows the edit it causes."""
+    roster_edits.mark_dirty(rid)
+    tid = trace_id.get()
+    if tid is not None:
+        edit_traces.setdefault(rid, []).append(tid)
 
-    # Add reaction controls
-    for emo in (EMO_ACTIVE, EMO_BREAK, EMO_AWAY):
-        await msg.add_reaction(emo)
+roster_edits = ShardedEditScheduler(flush_roster, shard_count=SHARD_COUNT or 1, window=ROSTER_EDIT_WINDOW,
+                                    max_latency=ROSTER_EDIT_MAX_LATENCY, guild_of=guild_of)
+
+
+# Status buttons on the first roster page; created in setup_hook
+roster_view: Optional[RosterView] = None
+
+async def on_roster_button(interaction: discord.Interaction, status: Status):
+    cog = bot.get_cog("Roster")
+    if cog is None:
+        await interaction.response.send_message("The roster is being updated; try again in a moment.", ephemeral=True)
+        return
+    await cog.on_roster_button(interaction, status)
 
-    await interaction.response.send_message("Roster message created and controls added.", ephemeral=True)
 
 def emoji_to_status(emoji: str) -> Optional[Status]:
     if emoji == EMO_ACTIVE:
@@ -183,85 +506,143 @@ def emoji_to_status(emoji: str) -> Optional[Status]:
         return "Away"
     return None
 
-@bot.event
-async def on_raw_reaction_add(payload: discord.RawReactionActionEvent):
-    gid = payload.guild_id
-    if gid is None or gid not in rosters or payload.user_id == bot.user.id:
-        return
-    chan_id, msg_id = rosters[gid]
-    if payload.message_id != msg_id:
-        return
+# Rosters being reconciled, with the reaction events that arrived meanwhile
+# (replayed once the rebuilt index is in place)
+reconciling: Dict[int, List[discord.RawReactionActionEvent]] = {}
 
-    status = emoji_to_status(str(payload.emoji))
-    if status is None:
-        return
+reconciled = False
 
-    # update this guild's map
-    gmap = guild_user_status.setdefault(gid, {})
-    gmap[payload.user_id] = status
+# Reaction events on roster messages seen per shard
+shard_stats = ShardStats()
 
-    guild = bot.get_guild(gid)
-    channel = guild.get_channel(chan_id)
-    msg = await channel.fetch_message(msg_id)
+def shard_report() -> List[str]:
+    """One line per shard this process runs: latency, rosters, event rate, pending edits."""
+    latencies = dict(bot.latencies) if SHARDED else {0: bot.latency}
+    lines = []
+    for sid in range(rosters.shard_count):
+        if sid not in latencies:
+            continue
+        lines.append(
+            f"Shard {sid}: {latencies[sid] * 1000:.0f} ms, {len(rosters.shard(sid))} rosters, "
+            f"{shard_stats.rate(sid):.2f} events/s ({shard_stats.totals.get(sid, 0)} total), "
+            f"{roster_edits.shards[sid].pending()} pending edits"
+        )
+    return lines
+
+
+async def partition_by_shard():
+    """Spread per-roster state over the shard count Discord settled on."""
+    count = bot.shard_count or 1
+    if count != rosters.shard_count:
+        guild_user_status.reshard(count)
+        rosters.reshard(count)
+        await roster_edits.reshard(count)
+        logging.info("Partitioned roster state over %d shards", count)
+
+
+def tree_hash(guild: Optional[discord.abc.Snowflake] = None) -> str:
+    """Hash of the commands a sync for `guild` (or globally) would upload."""
+    payload = [cmd.to_dict(bot.tree) for cmd in bot.tree.get_commands(guild=guild)]
+    payload.sort(key=lambda cmd: (cmd.get("type", 1), cmd["name"]))
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+
+async def sync_tree(guild: Optional[discord.abc.Snowflake] = None):
+    """Sync the command tree unless Discord already has this exact tree.
+
+    The hash of the last tree synced to each target is kept in the state
+    store, so reconnects and restarts without command changes skip the
+    (heavily rate limited) sync. FORCE_TREE_SYNC=1 syncs regardless.
+    """
+    key = f"tree_hash:{bot.application_id}:{guild.id if guild else 'global'}"
+    digest = tree_hash(guild)
+    if not FORCE_TREE_SYNC and await state_store.get_meta(key) == digest:
+        logging.info("Command tree unchanged, skipping sync")
+        return
+    await bot.tree.sync(guild=guild)
+    state_store.set_meta(key, digest)
 
-    # keep a single selection per user
-    for emo in (EMO_ACTIVE, EMO_BREAK, EMO_AWAY):
-        if emo != str(payload.emoji):
-            await msg.remove_reaction(emo, discord.Object(id=payload.user_id))
 
-    await msg.edit(content=build_roster_text(guild))
+async def sync_commands():
+    if GUILD_ID:
+        guild = discord.Object(id=GUILD_ID)
+        bot.tree.copy_global_to(guild=guild)
+        await sync_tree(guild)
+    else:
+        await sync_tree()
 
 
-@bot.event
-async def on_raw_reaction_remove(payload: discord.RawReactionActionEvent):
-    gid = payload.guild_id
-    if gid is None or gid not in rosters:
-        return
-    chan_id, msg_id = rosters[gid]
-    if payload.message_id != msg_id:
-        return
+# Features live in extensions under bot/cogs; their state stays in this module,
+# so /clock_reload swaps their code without losing statuses or queued edits
+EXTENSION_PACKAGE = "bot.cogs"
 
-    guild = bot.get_guild(gid)
-    channel = guild.get_channel(chan_id)
-    msg = await channel.fetch_message(msg_id)
+async def load_extensions():
+    for name in EXTENSIONS:
+        await bot.load_extension(f"{EXTENSION_PACKAGE}.{name}")
+    logging.info("Loaded extensions: %s", ", ".join(EXTENSIONS))
 
-    # if user has none of the status reactions left → Away
-    has_any = False
-    for reaction in msg.reactions:
-        if str(reaction.emoji) in (EMO_ACTIVE, EMO_BREAK, EMO_AWAY):
-            users = [u async for u in reaction.users()]
-            if any(u.id == payload.user_id for u in users):
-                has_any = True
-                break
-    if not has_any:
-        gmap = guild_user_status.setdefault(gid, {})
-        gmap[payload.user_id] = "Away"
-        await msg.edit(content=build_roster_text(guild))
+# State an extension hands to its next version across a reload, by cog name
+handover: Dict[str, dict] = {}
 
+def take_handover(cog_name: str) -> dict:
+    return handover.pop(cog_name, {})
 
 
 @bot.event
 async def on_ready():
+    await partition_by_shard()
     try:
-        if GUILD_ID:
-            guild = discord.Object(id=GUILD_ID)
-            bot.tree.copy_global_to(guild=guild)
-            await bot.tree.sync(guild=guild)
-        else:
-            await bot.tree.sync()
+        await sync_commands()
         logging.info(f"✅ Logged in as {bot.user}")
     except Exception as e:
         logging.exception("Command sync failed: %s", e)
 
+    global reconciled
+    if not reconciled:
+        reconciled = True
+        try:
+            cog = bot.get_cog("Roster")
+            if cog is not None:
+                await cog.reconcile_rosters()
+        finally:
+            # only now: an overdue status expiring before the reaction index
+            # is rebuilt would leave its reaction, and reconcile would restore it
+            status_timers.start()
+
 # --- start the bot ---
-logging.basicConfig(level=logging.INFO)
+setup_logging(as_json=LOG_FORMAT != "text")
 
 async def main():
     if not TOKEN:
         raise RuntimeError("DISCORD_TOKEN missing. Put it in your .env")
+    for rid, (gid, name) in state_store.load_named_rosters().items():
+        register_roster_name(rid, gid, name)
+    statuses, saved_rosters, saved_pages = state_store.load()
+    guild_user_status.update(statuses)
+    rosters.update(saved_rosters)
+    roster_by_message.update((mid, rid) for rid, (cid, mid) in saved_rosters.items())
+    roster_pages.update(saved_pages)
+    for rid, uid, status, at in state_store.load_transitions(time.time() - max(WINDOWS.values())):
+        shift_stats.transition(rid, uid, status, at)
+    for rid, gmap in statuses.items():
+        for uid, status in gmap.items():
+            shift_stats.transition(rid, uid, status)  # no-op unless the log predates the windows
+            schedule_expiry(rid, uid, status, shift_stats.since(rid, uid))
+    logging.info("Restored %d rosters (%d named) and %d status maps from %s",
+                 len(rosters), len(named_rosters), len(statuses), STATE_DB)
+    # docker stop / systemd send SIGTERM: shut down like Ctrl+C so pending
+    # roster edits and state writes are flushed
+    stopping: List[asyncio.Task] = []
+    def stop():
+        if not stopping:
+            stopping.append(asyncio.create_task(bot.close()))
+    try:
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stop)
+    except NotImplementedError:
+        pass   # no loop signal handlers on Windows
     async with bot:
         await bot.start(TOKEN)
+    await asyncio.gather(*stopping)
 
 if __name__ == "__main__":
-    import asyncio
     asyncio.run(main())
@@ -0,0 +1,145 @@
+import functools
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from aiohttp import web
+
+Labels = Tuple[Tuple[str, str], ...]
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _labels(labels: Labels, extra: str = "") -> str:
+    parts = [f'{k}="{v}"' for k, v in labels]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _value(v: float) -> str:
+    if v != v:
+        return "NaN"
+    if v in (float("inf"), float("-inf")):
+        return "+Inf" if v > 0 else "-Inf"
+    if isinstance(v, int) or float(v).is_integer():
+        return str(int(v))   # exact: counts past a million must not round
+    return repr(float(v))
+
+
+class Gauge:
+    """A gauge read from a callback at scrape time.
+
+    The callback returns either a number or a dict of {labels: number}.
+    Pass kind="counter" when the callback reads a running total.
+    """
+
+    def __init__(self, name: str, help: str, read: Callable[[], object], kind: str = "gauge"):
+        self.name = name
+        self.help = help
+        self.kind = kind
+        self.read = read
+
+    def samples(self) -> List[str]:
+        value = self.read()
+        if isinstance(value, dict):
+            return [f"{self.name}{_labels(k)} {_value(v)}" for k, v in value.items()]
+        return [f"{self.name} {_value(value)}"]
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.kind = "histogram"
+        self.buckets = buckets
+        self.values: Dict[Labels, List[float]] = {}   # bucket counts..., sum, count
+
+    def observe(self, value: float, **labels: str):
+        key = tuple(sorted(labels.items()))
+        row = self.values.get(key)
+        if row is None:
+            row = self.values[key] = [0.0] * (len(self.buckets) + 2)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                row[i] += 1
+        row[-2] += value
+        row[-1] += 1
+
+    def samples(self) -> List[str]:
+        lines = []
+        for key, row in self.values.items():
+            for bound, count in zip(self.buckets, row):
+                le = 'le="%s"' % bound
+                lines.append(f"{self.name}_bucket{_labels(key, le)} {_value(count)}")
+            le = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_labels(key, le)} {_value(row[-1])}")
+            lines.append(f"{self.name}_sum{_labels(key)} {_value(row[-2])}")
+            lines.append(f"{self.name}_count{_labels(key)} {_value(row[-1])}")
+        return lines
+
+    def time(self, **labels: str):
+        """Decorator timing every call of a coroutine function."""
+        def decorator(func):
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    self.observe(time.perf_counter() - start, **labels)
+            return wrapper
+        return decorator
+
+
+class Registry:
+    """Metrics in registration order, rendered in Prometheus text format."""
+
+    def __init__(self):
+        self.metrics: List[object] = []
+        self._runner: Optional[web.AppRunner] = None
+
+    def add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+    async def serve(self, host: str, port: int):
+        """Serve render() at http://host:port/metrics."""
+        async def handle(request: web.Request) -> web.Response:
+            return web.Response(text=self.render(), content_type="text/plain", charset="utf-8")
+
+        app = web.Application()
+        app.router.add_get("/metrics", handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+
+    async def close(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+def instrument_http(http, histogram: Histogram):
+    """Time every request the discord.py HTTPClient makes, labelled by route."""
+    request = http.request
+
+    async def timed_request(route, *args, **kwargs):
+        start = time.perf_counter()
+        status = "ok"
+        try:
+            return await request(route, *args, **kwargs)
+        except Exception as e:
+            status = type(e).__name__
+            raise
+        finally:
+            histogram.observe(time.perf_counter() - start, method=route.method, route=route.path, status=status)
+
+    http.request = timed_request
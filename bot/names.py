@@ -0,0 +1,117 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Set, Tuple
+
+import discord
+
+from bot.logs import untraced_task
+
+# Discord accepts at most 100 user ids per member request
+FETCH_BATCH = 100
+# A batch that fails is retried after RETRY_DELAY seconds, doubling up to MAX_RETRY_DELAY
+RETRY_DELAY = 5.0
+MAX_RETRY_DELAY = 300.0
+
+
+class NameCache:
+    """Display names of rostered users, per guild.
+
+    Names come from the member cache when it has them. Anything else is
+    collected for a short while and fetched in batches of up to 100 users
+    over the gateway; once a batch lands, on_resolved(guild_id, names) is
+    called with every user it looked up, None for those not in the guild.
+    A batch that fails is queued again and retried with backoff. Member
+    update events keep the cache fresh through update() and forget().
+
+    With max_size the cache is an LRU holding at most that many users, and
+    with ttl a name older than ttl seconds is served once more while a
+    fresh copy is fetched. Users who are not in the guild are cached as None;
+    absent() tells them apart from users whose lookup is still pending.
+    """
+
+    def __init__(self, on_resolved: Callable[[int, Dict[int, Optional[str]]], None], batch_delay: float = 0.5,
+                 max_size: Optional[int] = None, ttl: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        self.on_resolved = on_resolved
+        self.batch_delay = batch_delay
+        self.max_size = max_size
+        self.ttl = ttl
+        self.clock = clock
+        self._entries: "OrderedDict[Tuple[int, int], Tuple[Optional[str], float]]" = OrderedDict()
+        self._wanted: Dict[int, Set[int]] = {}
+        self._tasks: Dict[int, asyncio.Task] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, guild: discord.Guild, uid: int) -> Optional[str]:
+        key = (guild.id, uid)
+        entry = self._entries.get(key)
+        if entry is not None:
+            name, stamp = entry
+            self._entries.move_to_end(key)
+            if self.ttl is not None and self.clock() - stamp > self.ttl:
+                self._request(guild, uid)
+            return name
+        member = guild.get_member(uid)
+        if member is not None:
+            self._store(key, member.display_name)
+            return member.display_name
+        self._request(guild, uid)
+        return None
+
+    def absent(self, gid: int, uid: int) -> bool:
+        """True if the user was looked up and is not in the guild."""
+        entry = self._entries.get((gid, uid))
+        return entry is not None and entry[0] is None
+
+    def update(self, gid: int, uid: int, name: str) -> bool:
+        """Store a fresh name. Returns True if it differs from the cached one."""
+        old = self._entries.get((gid, uid))
+        self._store((gid, uid), name)
+        return old is None or old[0] != name
+
+    def forget(self, gid: int, uid: int):
+        self._store((gid, uid), None)
+
+    def _store(self, key: Tuple[int, int], name: Optional[str]):
+        self._entries[key] = (name, self.clock())
+        self._entries.move_to_end(key)
+        if self.max_size is not None:
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def _request(self, guild: discord.Guild, uid: int):
+        self._wanted.setdefault(guild.id, set()).add(uid)
+        if guild.id not in self._tasks:
+            self._tasks[guild.id] = untraced_task(self._fetch(guild))
+
+    async def _fetch(self, guild: discord.Guild):
+        delay = RETRY_DELAY
+        try:
+            await asyncio.sleep(self.batch_delay)
+            while self._wanted.get(guild.id):
+                wanted = self._wanted.pop(guild.id)
+                batch = list(wanted)[:FETCH_BATCH]
+                rest = wanted.difference(batch)
+                if rest:
+                    self._wanted.setdefault(guild.id, set()).update(rest)
+                try:
+                    members = await guild.query_members(user_ids=batch, limit=len(batch), cache=False)
+                except (asyncio.TimeoutError, discord.ClientException) as e:
+                    logging.warning("Fetching %d members of guild %s failed, retrying in %.0fs: %s",
+                                    len(batch), guild.id, delay, e)
+                    self._wanted.setdefault(guild.id, set()).update(batch)
+                    await asyncio.sleep(delay)
+                    delay = min(delay * 2, MAX_RETRY_DELAY)
+                    continue
+                delay = RETRY_DELAY
+                found = {m.id: m.display_name for m in members}
+                names = {uid: found.get(uid) for uid in batch}
+                for uid, name in names.items():
+                    self._store((guild.id, uid), name)
+                self.on_resolved(guild.id, names)
+        finally:
+            self._tasks.pop(guild.id, None)
@@ -0,0 +1,102 @@
+import asyncio
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, Hashable, Union
+
+
+class TokenBucket:
+    """Allow `rate` operations per `per` seconds, with bursts up to `rate`.
+
+    The clock is injectable so the bucket can be driven by a fake clock.
+    """
+
+    def __init__(self, rate: float, per: float, clock: Callable[[], float] = time.monotonic):
+        self.capacity = rate
+        self.fill_rate = rate / per
+        self.clock = clock
+        self.tokens = rate
+        self.updated = clock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.fill_rate)
+        self.updated = now
+
+    def try_acquire(self) -> bool:
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def delay(self) -> float:
+        """Seconds until the next token is available (0 if one is)."""
+        self._refill()
+        return max(0.0, (1 - self.tokens) / self.fill_rate)
+
+    async def acquire(self):
+        while not self.try_acquire():
+            await asyncio.sleep(self.delay())
+
+
+class SlidingWindow:
+    """Allow at most `rate` operations in any `per` seconds.
+
+    A TokenBucket lets a full burst be followed by refilled tokens inside
+    the same period; limits Discord counts over a window (channel topic
+    edits: 2 per 10 minutes) need this instead. Same interface as TokenBucket.
+    """
+
+    def __init__(self, rate: float, per: float, clock: Callable[[], float] = time.monotonic):
+        self.rate = int(rate)
+        self.per = per
+        self.clock = clock
+        self.sent: Deque[float] = deque()
+
+    def _expire(self, now: float):
+        while self.sent and self.sent[0] <= now - self.per:
+            self.sent.popleft()
+
+    def try_acquire(self) -> bool:
+        now = self.clock()
+        self._expire(now)
+        if len(self.sent) < self.rate:
+            self.sent.append(now)
+            return True
+        return False
+
+    def delay(self) -> float:
+        """Seconds until the oldest operation leaves the window (0 if one is allowed now)."""
+        now = self.clock()
+        self._expire(now)
+        if len(self.sent) < self.rate:
+            return 0.0
+        return self.sent[0] + self.per - now
+
+    async def acquire(self):
+        while not self.try_acquire():
+            await asyncio.sleep(self.delay())
+
+
+Limiter = Union[TokenBucket, SlidingWindow]
+
+
+class RouteBudget:
+    """One limiter (a TokenBucket by default) per route key (e.g. a channel id), created on first use."""
+
+    def __init__(self, rate: float, per: float, clock: Callable[[], float] = time.monotonic,
+                 limiter: Callable[..., Limiter] = TokenBucket):
+        self.rate = rate
+        self.per = per
+        self.clock = clock
+        self.limiter = limiter
+        self._buckets: Dict[Hashable, Limiter] = {}
+
+    def bucket(self, key: Hashable) -> Limiter:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = self.limiter(self.rate, self.per, self.clock)
+        return bucket
+
+    async def acquire(self, key: Hashable):
+        await self.bucket(key).acquire()
@@ -0,0 +1,68 @@
+from typing import Dict, Iterable, Optional, Set
+
+import discord
+
+from bot.ratelimit import TokenBucket
+
+
+class ReactionIndex:
+    """Which status emoji each user currently has on one roster message.
+
+    Kept up to date from raw reaction events so handlers can answer
+    "does this user still have a status reaction?" without paging through
+    reaction.users().
+    """
+
+    def __init__(self):
+        self._users: Dict[int, Set[str]] = {}
+
+    def add(self, user_id: int, emoji: str):
+        self._users.setdefault(user_id, set()).add(emoji)
+
+    def remove(self, user_id: int, emoji: str) -> Set[str]:
+        """Forget one reaction and return the emoji the user still has."""
+        emojis = self._users.get(user_id)
+        if emojis is None:
+            return set()
+        emojis.discard(emoji)
+        if not emojis:
+            del self._users[user_id]
+            return set()
+        return emojis
+
+    def emojis(self, user_id: int) -> Set[str]:
+        return self._users.get(user_id, set())
+
+    def __len__(self) -> int:
+        return len(self._users)
+
+    def users(self) -> Dict[int, Set[str]]:
+        return self._users
+
+    async def rebuild(self, msg: discord.Message, emojis: Iterable[str], ignore_id: int,
+                      budget: Optional[TokenBucket] = None):
+        """Replace the index with the reactions currently on `msg`.
+
+        Reaction users are read a page (100 users) at a time; with a budget
+        every page waits for a token first.
+        """
+        wanted = set(emojis)
+        users: Dict[int, Set[str]] = {}
+        for reaction in msg.reactions:
+            emo = str(reaction.emoji)
+            if emo not in wanted:
+                continue
+            # reaction.count sizes each request so a small reaction costs one call
+            remaining, after = reaction.count, None
+            while remaining > 0:
+                if budget is not None:
+                    await budget.acquire()
+                page = [user async for user in reaction.users(limit=min(remaining, 100), after=after)]
+                for user in page:
+                    if user.id != ignore_id:
+                        users.setdefault(user.id, set()).add(emo)
+                if len(page) < 100:
+                    break
+                remaining -= len(page)
+                after = discord.Object(id=max(user.id for user in page))
+        self._users = users
@@ -0,0 +1,149 @@
+import itertools
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+
+STATUSES = ("Modding", "Break", "Away")
+
+_versions = itertools.count(1)
+
+
+class _Chunk:
+    """A run of users in one bucket that fits on one roster line."""
+    __slots__ = ("labels", "size", "text")
+
+    def __init__(self):
+        self.labels: Dict[int, str] = {}
+        self.size = 0
+        self.text: Optional[str] = None
+
+
+class RosterModel:
+    """One guild's users bucketed by status, with the joined name lists cached.
+
+    Each bucket is split into chunks of at most `chunk_limit` characters.
+    A user stays in the chunk they joined until their status changes, so a
+    change rewrites at most one chunk per bucket involved and the other
+    chunks (and the roster pages built from them) keep their text.
+
+    Users given no name (their lookup is still running) keep their place
+    but are left out of the text; missing() counts them. `version` changes on every
+    change to the model.
+    """
+
+    def __init__(self, chunk_limit: int = 1800):
+        self.chunk_limit = chunk_limit
+        self._chunks: Dict[str, List[_Chunk]] = {s: [] for s in STATUSES}
+        self._where: Dict[int, _Chunk] = {}
+        self._missing: Dict[str, Set[int]] = {s: set() for s in STATUSES}  # name still being looked up
+        self._status: Dict[int, str] = {}
+        self._segments: Dict[str, str] = {}
+        self.version = next(_versions)
+
+    def set(self, uid: int, status: str, name: Optional[str]):
+        old = self._status.get(uid)
+        if old == status:
+            self.rename(uid, name)
+            return
+        if old is not None:
+            self._remove(uid, old)
+        self._status[uid] = status
+        label = name if name is not None else f"<@{uid}>"
+        chunks = self._chunks[status]
+        chunk = next((c for c in chunks if c.size + len(label) + 2 <= self.chunk_limit), None)
+        if chunk is None:
+            chunk = _Chunk()
+            chunks.append(chunk)
+        self._where[uid] = chunk
+        self._label(uid, status, chunk, name)
+
+    def rename(self, uid: int, name: Optional[str]) -> bool:
+        """Update a user's label in place. Returns True if it changed."""
+        status = self._status.get(uid)
+        if status is None:
+            return False
+        chunk = self._where[uid]
+        label = name if name is not None else f"<@{uid}>"
+        if chunk.labels[uid] == label and (name is None) == (uid in self._missing[status]):
+            return False
+        self._label(uid, status, chunk, name)
+        return True
+
+    def _label(self, uid: int, status: str, chunk: _Chunk, name: Optional[str]):
+        label = name if name is not None else f"<@{uid}>"
+        old = chunk.labels.get(uid)
+        if old is not None:
+            chunk.size -= len(old) + 2
+        # re-assigning an existing key keeps the user's place in the chunk
+        chunk.labels[uid] = label
+        chunk.size += len(label) + 2
+        chunk.text = None
+        if name is None:
+            self._missing[status].add(uid)
+        else:
+            self._missing[status].discard(uid)
+        self._invalidate(status)
+
+    def _remove(self, uid: int, status: str):
+        chunk = self._where.pop(uid)
+        chunk.size -= len(chunk.labels.pop(uid)) + 2
+        chunk.text = None
+        if not chunk.labels:
+            self._chunks[status].remove(chunk)
+        self._missing[status].discard(uid)
+        self._invalidate(status)
+
+    def _invalidate(self, status: str):
+        self._segments.pop(status, None)
+        self.version = next(_versions)
+
+    def status_of(self, uid: int) -> Optional[str]:
+        return self._status.get(uid)
+
+    def count(self, status: str) -> int:
+        return sum(len(c.labels) for c in self._chunks[status])
+
+    def missing(self, status: str) -> int:
+        """Users in the bucket whose display name is not known yet."""
+        return len(self._missing[status])
+
+    def chunks(self, status: str) -> List[str]:
+        """The bucket's known names as comma separated chunks, in order."""
+        missing = self._missing[status]
+        texts = []
+        for chunk in self._chunks[status]:
+            if chunk.text is None:
+                chunk.text = ", ".join(label for uid, label in chunk.labels.items() if uid not in missing)
+            if chunk.text:
+                texts.append(chunk.text)
+        return texts
+
+    def names(self, status: str) -> str:
+        """Comma separated known names in one bucket ("" when empty)."""
+        text = self._segments.get(status)
+        if text is None:
+            text = self._segments[status] = ", ".join(self.chunks(status))
+        return text
+
+
+class RosterSnapshot(NamedTuple):
+    """One guild's roster as rendered at one model version.
+
+    Every surface (roster message, channel topic, mirrors) shows the same
+    snapshot, so they agree on names, on missing members and on the time.
+    """
+    version: int
+    stamp: str               # "HH:MM UTC" when this version was rendered
+    pages: Tuple[str, ...]   # roster message pages, without the "Updated" line
+    topic: str
+
+
+def paginate(lines: List[str], limit: int) -> List[str]:
+    """Pack lines into pages of at most `limit` characters, in order."""
+    pages, page = [], ""
+    for line in lines:
+        if page and len(page) + 1 + len(line) > limit:
+            pages.append(page)
+            page = line
+        else:
+            page = f"{page}\n{line}" if page else line
+    pages.append(page)
+    return pages
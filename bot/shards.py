@@ -0,0 +1,86 @@
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, Iterator, List, MutableMapping, Tuple, TypeVar
+
+V = TypeVar("V")
+
+
+def shard_of(guild_id: int, shard_count: int) -> int:
+    """The shard Discord routes a guild's events to."""
+    return (guild_id >> 22) % shard_count
+
+
+class ShardedDict(MutableMapping[int, V]):
+    """A guild-keyed dict stored as one plain dict per shard.
+
+    Reads and writes look like a normal dict, but each shard's guilds live
+    in their own partition so a shard's state can be handed around (or
+    dropped) on its own via shard(). Keys that are not guild ids are placed
+    by the guild guild_of(key) returns.
+    """
+
+    def __init__(self, shard_count: int = 1, guild_of: Callable[[int], int] = int):
+        self.shard_count = shard_count
+        self.guild_of = guild_of
+        self._parts: List[Dict[int, V]] = [{} for _ in range(shard_count)]
+
+    def shard(self, shard_id: int) -> Dict[int, V]:
+        return self._parts[shard_id]
+
+    def reshard(self, shard_count: int):
+        """Re-partition every entry for a new shard count."""
+        if shard_count == self.shard_count:
+            return
+        items = list(self.items())
+        self.shard_count = shard_count
+        self._parts = [{} for _ in range(shard_count)]
+        for gid, value in items:
+            self[gid] = value
+
+    def _part(self, guild_id: int) -> Dict[int, V]:
+        return self._parts[shard_of(self.guild_of(guild_id), self.shard_count)]
+
+    def __getitem__(self, guild_id: int) -> V:
+        return self._part(guild_id)[guild_id]
+
+    def __setitem__(self, guild_id: int, value: V):
+        self._part(guild_id)[guild_id] = value
+
+    def __delitem__(self, guild_id: int):
+        del self._part(guild_id)[guild_id]
+
+    def __contains__(self, guild_id: object) -> bool:
+        return isinstance(guild_id, int) and guild_id in self._part(guild_id)
+
+    def __iter__(self) -> Iterator[int]:
+        for part in self._parts:
+            yield from part
+
+    def __len__(self) -> int:
+        return sum(len(part) for part in self._parts)
+
+
+class ShardStats:
+    """Per-shard event counts with a rate over the last `window` seconds."""
+
+    def __init__(self, window: int = 60):
+        self.window = window
+        self.totals: Dict[int, int] = {}
+        self._seconds: Dict[int, Deque[Tuple[int, int]]] = {}  # shard -> (second, count)
+
+    def record(self, shard_id: int):
+        self.totals[shard_id] = self.totals.get(shard_id, 0) + 1
+        now = int(time.monotonic())
+        seconds = self._seconds.setdefault(shard_id, deque())
+        if seconds and seconds[-1][0] == now:
+            seconds[-1] = (now, seconds[-1][1] + 1)
+        else:
+            seconds.append((now, 1))
+        while seconds[0][0] <= now - self.window:
+            seconds.popleft()
+
+    def rate(self, shard_id: int) -> float:
+        """Events per second for the shard over the window."""
+        cutoff = int(time.monotonic()) - self.window
+        seconds = self._seconds.get(shard_id, ())
+        return sum(count for second, count in seconds if second > cutoff) / self.window
@@ -0,0 +1,111 @@
+"""Shared roster state for several bot processes (see bot.backend.SocketBackend).
+
+    python -m bot.stateserver --socket /run/sybot/state.sock
+
+Holds statuses, roster locations and roster names in memory. Each connected bot first
+sends a seed with the state it loaded (added for keys the server lacks)
+and gets everything back; after that every change a bot sends is applied
+and forwarded to all bots, the sender included. A change that alters
+nothing goes back to its sender only, so the sender knows it is settled.
+Changes are handled one at a time on a single event loop, so they are
+atomic and every bot sees them in the same order.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+from typing import Dict, List, Set, Tuple
+
+
+class StateServer:
+    def __init__(self):
+        self.statuses: Dict[Tuple[int, int], str] = {}
+        self.rosters: Dict[int, Tuple[int, int]] = {}
+        self.names: Dict[int, Tuple[int, str]] = {}
+        self.clients: Set[asyncio.StreamWriter] = set()
+
+    def seed(self, message: dict) -> dict:
+        for rid, gid, name in message.get("names", ()):
+            self.names.setdefault(rid, (gid, name))
+        for gid, uid, status in message["statuses"]:
+            self.statuses.setdefault((gid, uid), status)
+        for gid, cid, mid in message["rosters"]:
+            self.rosters.setdefault(gid, (cid, mid))
+        return {
+            "names": [[rid, *owner] for rid, owner in self.names.items()],
+            "statuses": [[gid, uid, s] for (gid, uid), s in self.statuses.items()],
+            "rosters": [[gid, *loc] for gid, loc in self.rosters.items()],
+        }
+
+    def apply(self, change: dict) -> bool:
+        """Apply a change. Returns False if it changed nothing."""
+        if change["op"] == "status":
+            key = (change["guild_id"], change["user_id"])
+            if self.statuses.get(key) == change["status"]:
+                return False
+            self.statuses[key] = change["status"]
+        elif change["op"] == "roster":
+            gid, loc = change["guild_id"], change["loc"]
+            if loc is None:
+                return self.rosters.pop(gid, None) is not None
+            if self.rosters.get(gid) == tuple(loc):
+                return False
+            self.rosters[gid] = tuple(loc)
+        elif change["op"] == "name":
+            # a roster's name never changes once given
+            if change["roster_id"] in self.names:
+                return False
+            self.names[change["roster_id"]] = (change["guild_id"], change["name"])
+        else:
+            return False
+        return True
+
+    def broadcast(self, line: bytes):
+        for writer in list(self.clients):
+            if writer.is_closing():
+                self.clients.discard(writer)
+            else:
+                writer.write(line)
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            hello = json.loads(await reader.readline() or b"null")
+            if not hello or hello.get("op") != "seed":
+                return
+            writer.write(json.dumps(self.seed(hello)).encode() + b"\n")
+            self.clients.add(writer)
+            logging.info("Bot connected (%d connected)", len(self.clients))
+            while line := await reader.readline():
+                if self.apply(json.loads(line)):
+                    self.broadcast(line)
+                else:
+                    writer.write(line)
+                # the sender waits on its own change like everyone else
+                await writer.drain()
+        except (OSError, ValueError) as e:
+            logging.warning("Dropping a bot connection: %s", e)
+        finally:
+            self.clients.discard(writer)
+            writer.close()
+
+
+async def serve(path: str):
+    if os.path.exists(path):
+        os.unlink(path)
+    server = StateServer()
+    async with await asyncio.start_unix_server(server.handle, path, limit=2 ** 24) as unix_server:
+        logging.info("Serving roster state on %s", path)
+        await unix_server.serve_forever()
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--socket", default="sybot-state.sock", help="Unix socket to listen on")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(serve(args.socket))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+# Rolling windows reported by /clock_stats, in seconds
+WINDOWS = {"day": 86400, "week": 7 * 86400, "month": 30 * 86400}
+TRACKED = ("Modding", "Break")
+
+
+class _Window:
+    """Running totals of a user's closed stretches over the last `span` seconds.
+
+    Stretches are kept whole, oldest first. Those that ended before the
+    window are dropped from the totals; the one that started before it is
+    clipped when the totals are read.
+    """
+
+    __slots__ = ("span", "stretches", "totals")
+
+    def __init__(self, span: int):
+        self.span = span
+        self.stretches: Deque[Tuple[float, float, str]] = deque()  # (start, end, status)
+        self.totals = {s: 0.0 for s in TRACKED}
+
+    def add(self, start: float, end: float, status: str):
+        self.stretches.append((start, end, status))
+        self.totals[status] += end - start
+
+    def read(self, now: float) -> Dict[str, float]:
+        cutoff = now - self.span
+        while self.stretches and self.stretches[0][1] <= cutoff:
+            start, end, status = self.stretches.popleft()
+            self.totals[status] -= end - start
+        totals = dict(self.totals)
+        if self.stretches and self.stretches[0][0] < cutoff:
+            start, _, status = self.stretches[0]
+            totals[status] -= cutoff - start
+        return totals
+
+
+class _UserStats:
+    __slots__ = ("status", "since", "windows")
+
+    def __init__(self, status: Optional[str], since: float):
+        self.status = status
+        self.since = since
+        self.windows = {name: _Window(span) for name, span in WINDOWS.items()}
+
+
+class ShiftStats:
+    """Modding and Break time per user and guild over rolling windows.
+
+    transition() closes the user's current stretch and appends it to every
+    window's running totals: constant work however long the stretch was.
+    A query drops the stretches that left the window, clips the one that
+    straddles its start and adds the still-open stretch.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.time):
+        self.clock = clock
+        self._users: Dict[int, Dict[int, _UserStats]] = {}
+
+    def transition(self, gid: int, uid: int, status: str, at: Optional[float] = None) -> bool:
+        """Record a status change. Returns False if the status did not change."""
+        at = self.clock() if at is None else at
+        users = self._users.setdefault(gid, {})
+        user = users.get(uid)
+        if user is None:
+            users[uid] = _UserStats(status, at)
+            return True
+        if user.status == status:
+            return False
+        if user.status in TRACKED:
+            self._credit(user, user.status, user.since, at)
+        user.status = status
+        user.since = at
+        return True
+
+    def since(self, gid: int, uid: int) -> Optional[float]:
+        """When the user's current status began, if known."""
+        user = self._users.get(gid, {}).get(uid)
+        return user.since if user is not None else None
+
+    def _credit(self, user: _UserStats, status: str, start: float, end: float):
+        for window in user.windows.values():
+            window.add(start, end, status)
+
+    def totals(self, gid: int, uid: int, window: str) -> Dict[str, float]:
+        """Seconds spent in each tracked status over the window, up to now."""
+        user = self._users.get(gid, {}).get(uid)
+        if user is None:
+            return {s: 0.0 for s in TRACKED}
+        now = self.clock()
+        win = user.windows[window]
+        totals = win.read(now)
+        if user.status in TRACKED:
+            totals[user.status] += now - max(user.since, now - win.span)
+        return totals
+
+    def top(self, gid: int, window: str, status: str = "Modding", limit: int = 10) -> List[Tuple[int, float]]:
+        """The users with the most time in `status` over the window."""
+        ranked = [(uid, self.totals(gid, uid, window)[status]) for uid in self._users.get(gid, {})]
+        ranked = [entry for entry in ranked if entry[1] > 0]
+        ranked.sort(key=lambda entry: entry[1], reverse=True)
+        return ranked[:limit]
+
+
+def format_duration(seconds: float) -> str:
+    minutes = int(seconds // 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}h {minutes:02d}m" if hours else f"{minutes}m"
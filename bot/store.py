@@ -0,0 +1,236 @@
+import asyncio
+import logging
+import sqlite3
+import time
+from typing import Dict, List, Optional, Tuple
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS statuses (
+    guild_id INTEGER NOT NULL,
+    user_id  INTEGER NOT NULL,
+    status   TEXT NOT NULL,
+    PRIMARY KEY (guild_id, user_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS rosters (
+    guild_id   INTEGER PRIMARY KEY,
+    channel_id INTEGER NOT NULL,
+    message_id INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS roster_pages (
+    guild_id   INTEGER NOT NULL,
+    page       INTEGER NOT NULL,
+    message_id INTEGER NOT NULL,
+    PRIMARY KEY (guild_id, page)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS named_rosters (
+    roster_id INTEGER PRIMARY KEY,
+    guild_id  INTEGER NOT NULL,
+    name      TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS transitions (
+    guild_id INTEGER NOT NULL,
+    user_id  INTEGER NOT NULL,
+    status   TEXT NOT NULL,
+    at       REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS transitions_at ON transitions (at);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+# How often transitions older than keep_transitions are deleted, in seconds
+PRUNE_INTERVAL = 3600
+
+
+class StateStore:
+    """SQLite copy of guild_user_status, rosters and roster_pages, a log of
+    status transitions, and a small key/value table (meta) for bookkeeping
+    such as command tree hashes.
+
+    The guild_id columns hold roster ids: the guild id for a guild's default
+    roster, else the roster_id of a row in named_rosters.
+
+    Writes are only recorded in memory by the event handlers and written
+    out in batches by a background task (on a worker thread), so the event
+    loop never waits on disk. Later writes to the same key replace earlier
+    ones before they ever reach the database. With keep_transitions, the
+    writer also deletes transitions older than that many seconds, at most
+    once per PRUNE_INTERVAL, keeping each user's last one before the cutoff.
+    """
+
+    def __init__(self, path: str, flush_interval: float = 1.0, keep_transitions: Optional[float] = None):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.keep_transitions = keep_transitions
+        self._next_prune = 0.0
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+        self._statuses: Dict[Tuple[int, int], str] = {}
+        self._rosters: Dict[int, Optional[Tuple[int, int]]] = {}  # None = delete
+        self._pages: Dict[int, List[int]] = {}
+        self._meta: Dict[str, str] = {}
+        self._names: Dict[int, Tuple[int, str]] = {}
+        self._transitions: List[Tuple[int, int, str, float]] = []
+        self._lock = asyncio.Lock()
+        self._stop = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def load(self) -> Tuple[Dict[int, Dict[int, str]], Dict[int, Tuple[int, int]], Dict[int, List[int]]]:
+        """Read everything back. Called once before the bot connects."""
+        statuses: Dict[int, Dict[int, str]] = {}
+        for gid, uid, status in self._db.execute("SELECT guild_id, user_id, status FROM statuses"):
+            gmap = statuses.get(gid)
+            if gmap is None:
+                gmap = statuses[gid] = {}
+            gmap[uid] = status
+        rosters = {gid: (cid, mid) for gid, cid, mid in
+                   self._db.execute("SELECT guild_id, channel_id, message_id FROM rosters")}
+        pages: Dict[int, List[int]] = {}
+        for gid, mid in self._db.execute("SELECT guild_id, message_id FROM roster_pages ORDER BY guild_id, page"):
+            pages.setdefault(gid, []).append(mid)
+        return statuses, rosters, pages
+
+    def load_transitions(self, since: float) -> List[Tuple[int, int, str, float]]:
+        """Transitions at or after `since`, oldest first, each user's led by the last one before it.
+
+        That earlier transition holds the status a user was in at `since`,
+        so a stretch crossing it is counted. Called before the bot connects.
+        """
+        # with MAX(), SQLite takes the bare columns from the row holding the maximum
+        before = self._db.execute(
+            "SELECT guild_id, user_id, status, MAX(at) FROM transitions WHERE at < ? GROUP BY guild_id, user_id",
+            (since,)).fetchall()
+        after = self._db.execute(
+            "SELECT guild_id, user_id, status, at FROM transitions WHERE at >= ? ORDER BY at",
+            (since,)).fetchall()
+        return sorted(before, key=lambda row: row[3]) + after
+
+    def load_named_rosters(self) -> Dict[int, Tuple[int, str]]:
+        """Roster id -> (guild id, name) of every named roster. Called before the bot connects."""
+        return {rid: (gid, name) for rid, gid, name in
+                self._db.execute("SELECT roster_id, guild_id, name FROM named_rosters")}
+
+    def set_status(self, guild_id: int, user_id: int, status: str):
+        self._statuses[(guild_id, user_id)] = status
+
+    def set_roster(self, guild_id: int, channel_id: int, message_id: int):
+        self._rosters[guild_id] = (channel_id, message_id)
+
+    def delete_roster(self, guild_id: int):
+        self._rosters[guild_id] = None
+        self._pages[guild_id] = []
+
+    def name_roster(self, roster_id: int, guild_id: int, name: str):
+        self._names[roster_id] = (guild_id, name)
+
+    def set_roster_pages(self, guild_id: int, message_ids: List[int]):
+        self._pages[guild_id] = list(message_ids)
+
+    def record_transition(self, guild_id: int, user_id: int, status: str, at: float):
+        self._transitions.append((guild_id, user_id, status, at))
+
+    def set_meta(self, key: str, value: str):
+        self._meta[key] = value
+
+    async def get_meta(self, key: str) -> Optional[str]:
+        if key in self._meta:
+            return self._meta[key]
+        async with self._lock:
+            row = await asyncio.to_thread(
+                lambda: self._db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone())
+        return row[0] if row else None
+
+    def pending(self) -> int:
+        return (len(self._statuses) + len(self._rosters) + len(self._pages) + len(self._meta) + len(self._names)
+                + len(self._transitions))
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while not self._stop.is_set():
+            try:
+                await asyncio.wait_for(self._stop.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            try:
+                await self.flush()
+            except Exception:
+                logging.exception("Writing state to %s failed", self.path)
+
+    async def flush(self):
+        async with self._lock:
+            if not self.pending():
+                return
+            statuses, self._statuses = self._statuses, {}
+            rosters, self._rosters = self._rosters, {}
+            pages, self._pages = self._pages, {}
+            meta, self._meta = self._meta, {}
+            names, self._names = self._names, {}
+            transitions, self._transitions = self._transitions, []
+            now = time.time()
+            prune_before = None
+            if self.keep_transitions is not None and now >= self._next_prune:
+                prune_before = now - self.keep_transitions
+                self._next_prune = now + PRUNE_INTERVAL
+            try:
+                await asyncio.to_thread(self._write, statuses, rosters, pages, meta, names, transitions, prune_before)
+            except Exception:
+                self._next_prune = 0.0
+                # keep the batch for the next attempt unless newer writes replaced it
+                for key, value in statuses.items():
+                    self._statuses.setdefault(key, value)
+                for key, loc in rosters.items():
+                    self._rosters.setdefault(key, loc)
+                for key, ids in pages.items():
+                    self._pages.setdefault(key, ids)
+                for key, value in meta.items():
+                    self._meta.setdefault(key, value)
+                for key, owner in names.items():
+                    self._names.setdefault(key, owner)
+                self._transitions[:0] = transitions
+                raise
+
+    def _write(self, statuses: Dict[Tuple[int, int], str], rosters: Dict[int, Optional[Tuple[int, int]]],
+               pages: Dict[int, List[int]], meta: Dict[str, str], names: Dict[int, Tuple[int, str]],
+               transitions: List[Tuple[int, int, str, float]], prune_before: Optional[float] = None):
+        with self._db:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO statuses (guild_id, user_id, status) VALUES (?, ?, ?)",
+                [(gid, uid, status) for (gid, uid), status in statuses.items()])
+            self._db.executemany(
+                "INSERT OR REPLACE INTO rosters (guild_id, channel_id, message_id) VALUES (?, ?, ?)",
+                [(gid, *loc) for gid, loc in rosters.items() if loc is not None])
+            self._db.executemany(
+                "DELETE FROM rosters WHERE guild_id = ?",
+                [(gid,) for gid, loc in rosters.items() if loc is None])
+            self._db.executemany("DELETE FROM roster_pages WHERE guild_id = ?", [(gid,) for gid in pages])
+            self._db.executemany(
+                "INSERT INTO roster_pages (guild_id, page, message_id) VALUES (?, ?, ?)",
+                [(gid, page, mid) for gid, ids in pages.items() for page, mid in enumerate(ids, 1)])
+            self._db.executemany(
+                "INSERT INTO transitions (guild_id, user_id, status, at) VALUES (?, ?, ?, ?)", transitions)
+            if prune_before is not None:
+                # each user's last older transition still says what they were doing at the cutoff
+                self._db.execute(
+                    "DELETE FROM transitions WHERE at < ? AND rowid NOT IN "
+                    "(SELECT rowid FROM (SELECT rowid, MAX(at) FROM transitions WHERE at < ? GROUP BY guild_id, user_id))",
+                    (prune_before, prune_before))
+            self._db.executemany(
+                "INSERT OR REPLACE INTO named_rosters (roster_id, guild_id, name) VALUES (?, ?, ?)",
+                [(rid, *owner) for rid, owner in names.items()])
+            self._db.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", meta.items())
+
+    async def close(self):
+        """Stop the background writer and write out whatever is pending."""
+        self._stop.set()
+        if self._task is not None:
+            await self._task
+            self._task = None
+        await self.flush()
+        self._db.close()
@@ -0,0 +1,91 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from typing import Callable, Dict, Hashable, List, Optional, Tuple
+
+
+class DeadlineScheduler:
+    """Many per-key deadlines served by one task and one min-heap.
+
+    schedule() sets or moves a key's deadline in O(log n); the heap entry
+    it replaces is left behind and skipped when it surfaces (the heap is
+    rebuilt once stale entries outnumber live ones). Once a deadline
+    passes the task waits `batch` more seconds and hands every key that is
+    due by then to on_expire(keys) in one call, so keys expiring together
+    are applied together.
+    """
+
+    def __init__(self, on_expire: Callable[[List[Hashable]], None], batch: float = 1.0,
+                 clock: Callable[[], float] = time.time):
+        self.on_expire = on_expire
+        self.batch = batch
+        self.clock = clock
+        self._deadlines: Dict[Hashable, float] = {}
+        self._heap: List[Tuple[float, int, Hashable]] = []
+        self._seq = itertools.count()
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._deadlines)
+
+    def deadline(self, key: Hashable) -> Optional[float]:
+        return self._deadlines.get(key)
+
+    def schedule(self, key: Hashable, deadline: float):
+        self._deadlines[key] = deadline
+        if not self._heap or deadline < self._heap[0][0]:
+            self._wake.set()   # the task sleeps until a later deadline, or indefinitely
+        heapq.heappush(self._heap, (deadline, next(self._seq), key))
+        if len(self._heap) > 2 * len(self._deadlines) + 64:
+            self._heap = [(d, next(self._seq), k) for k, d in self._deadlines.items()]
+            heapq.heapify(self._heap)
+
+    def cancel(self, key: Hashable):
+        self._deadlines.pop(key, None)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def _pop_due(self, now: float) -> List[Hashable]:
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            deadline, _, key = heapq.heappop(self._heap)
+            if self._deadlines.get(key) == deadline:
+                del self._deadlines[key]
+                due.append(key)
+        return due
+
+    async def _run(self):
+        while True:
+            self._wake.clear()
+            # drop stale entries so the head is a live deadline
+            while self._heap and self._deadlines.get(self._heap[0][2]) != self._heap[0][0]:
+                heapq.heappop(self._heap)
+            timeout = self._heap[0][0] - self.clock() if self._heap else None
+            if timeout is None or timeout > 0:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await asyncio.sleep(self.batch)
+            due = self._pop_due(self.clock())
+            if not due:
+                continue   # rescheduled or cancelled meanwhile
+            try:
+                self.on_expire(due)
+            except Exception:
+                logging.exception("Handling %d expired deadlines failed", len(due))
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
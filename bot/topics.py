@@ -0,0 +1,65 @@
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Dict, Tuple
+
+import discord
+
+from bot.logs import untraced_task
+from bot.ratelimit import RouteBudget, SlidingWindow
+
+
+class TopicPublisher:
+    """Channel topic edits that respect Discord's limit of 2 per 10 minutes.
+
+    submit() only records the newest topic for a channel. One task per
+    channel publishes whatever is newest once the channel's window allows
+    another edit, so topics that were replaced while waiting are never sent
+    (last write wins). `published` and `suppressed` count both outcomes.
+    Clock and sleep are injectable for driving it with a fake clock.
+    """
+
+    def __init__(self, rate: float = 2, per: float = 600,
+                 clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], Awaitable[None]] = asyncio.sleep):
+        self.budget = RouteBudget(rate, per, clock, limiter=SlidingWindow)
+        self.sleep = sleep
+        self.published = 0
+        self.suppressed = 0
+        self._latest: Dict[int, Tuple[discord.TextChannel, str]] = {}
+        self._current: Dict[int, str] = {}   # last topic we set per channel
+        self._tasks: Dict[int, asyncio.Task] = {}
+
+    def submit(self, channel: discord.TextChannel, topic: str):
+        if channel.id in self._latest:
+            self.suppressed += 1   # the waiting topic is superseded
+        self._latest[channel.id] = (channel, topic)
+        if channel.id not in self._tasks:
+            self._tasks[channel.id] = untraced_task(self._run(channel.id))
+
+    def pending(self) -> int:
+        return len(self._latest)
+
+    async def _run(self, channel_id: int):
+        bucket = self.budget.bucket(channel_id)
+        try:
+            while channel_id in self._latest:
+                if self._latest[channel_id][1] == self._current.get(channel_id):
+                    del self._latest[channel_id]
+                    self.suppressed += 1
+                    break
+                delay = bucket.delay()
+                if delay > 0:
+                    await self.sleep(delay)
+                    continue
+                bucket.try_acquire()
+                channel, topic = self._latest.pop(channel_id)
+                try:
+                    await channel.edit(topic=topic, reason="Updating modding status")
+                except discord.HTTPException as e:
+                    logging.warning("Setting the topic of channel %s failed: %s", channel_id, e)
+                    continue
+                self._current[channel_id] = topic
+                self.published += 1
+        finally:
+            self._tasks.pop(channel_id, None)
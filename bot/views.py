@@ -0,0 +1,29 @@
+from typing import Awaitable, Callable
+
+import discord
+
+
+class RosterView(discord.ui.View):
+    """Modding / Break / Away buttons under the first roster page.
+
+    The buttons have fixed custom_ids and the view never times out, so once
+    it is registered with bot.add_view() clicks on roster messages sent
+    before a restart still arrive. Every click calls on_select(interaction,
+    status), which must respond to the interaction.
+    """
+
+    def __init__(self, on_select: Callable[[discord.Interaction, str], Awaitable[None]]):
+        super().__init__(timeout=None)
+        self.on_select = on_select
+
+    @discord.ui.button(label="Modding", emoji="🟢", style=discord.ButtonStyle.success, custom_id="sybot:roster:Modding")
+    async def modding(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self.on_select(interaction, "Modding")
+
+    @discord.ui.button(label="Break", emoji="☕", style=discord.ButtonStyle.primary, custom_id="sybot:roster:Break")
+    async def on_break(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self.on_select(interaction, "Break")
+
+    @discord.ui.button(label="Away", emoji="⛔", style=discord.ButtonStyle.secondary, custom_id="sybot:roster:Away")
+    async def away(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self.on_select(interaction, "Away")
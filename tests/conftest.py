@@ -0,0 +1,69 @@
+"""One bot from bot.main, running offline on bench.fakediscord.
+
+bot.main holds process-wide state, so every test shares the bot and its
+event loop; each roster gets a guild of its own.
+"""
+import asyncio
+import itertools
+import os
+
+import pytest
+
+os.environ.update(STATE_DB=":memory:", MEMBERS_INTENT="1", LOG_FORMAT="text",
+                  ROSTER_EDIT_WINDOW="0.01", ROSTER_EDIT_MAX_LATENCY="0.05")
+
+import bot.main as core  # noqa: E402
+from bench.fakediscord import FakeGateway, FakeHTTP  # noqa: E402
+from bot.reactions import ReactionIndex  # noqa: E402
+
+_next_guild = itertools.count(1)
+
+
+@pytest.fixture(scope="session")
+def loop():
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+
+@pytest.fixture
+def run(loop):
+    """Run a coroutine on the shared loop."""
+    return loop.run_until_complete
+
+
+@pytest.fixture(scope="session")
+def gateway(loop):
+    gateway = FakeGateway(core.bot, FakeHTTP(latency=0))
+    loop.run_until_complete(gateway.connect())
+    loop.run_until_complete(core.load_extensions())
+    yield gateway
+    loop.run_until_complete(core.bot.close())
+
+
+@pytest.fixture
+def http(gateway):
+    gateway.http.calls.clear()
+    return gateway.http
+
+
+@pytest.fixture
+def roster(gateway):
+    """A guild with ten members and its default roster; returns (roster id, channel id, message id)."""
+    gid = next(_next_guild) << 22
+    cid, mid = gid + 1, gid + 2
+    gateway.add_guild(gid, [cid], range(1000, 1010))
+    core.set_roster(gid, cid, mid)
+    core.reaction_index[gid] = ReactionIndex()
+    return gid, cid, mid
+
+
+@pytest.fixture
+def settle(run):
+    """Wait until dispatched events, queued roster edits and background cleanups are done."""
+    async def quiet():
+        while True:
+            await asyncio.sleep(0.02)
+            if not core.roster_edits.active() and not core.cleanup_tasks:
+                return
+    return lambda: run(quiet())
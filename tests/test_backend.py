@@ -0,0 +1,101 @@
+import asyncio
+import os
+import tempfile
+
+from bot.backend import SocketBackend
+from bot.stateserver import StateServer
+
+GID, UID = 1 << 22, 1001
+
+
+class Process:
+    """A SocketBackend with the status dict a bot process would keep."""
+
+    def __init__(self, path: str):
+        self.statuses = {}
+        self.applied = []   # statuses reported by the backend
+        self.backend = SocketBackend(path, retry=0.02)
+        self.backend.on_status = self.on_status
+
+    def on_status(self, gid: int, uid: int, status: str):
+        self.applied.append(status)
+        self.statuses.setdefault(gid, {})[uid] = status
+
+    def set_status(self, status: str):
+        self.statuses.setdefault(GID, {})[UID] = status
+        self.backend.set_status(GID, UID, status)
+
+    def status(self) -> str:
+        return self.statuses.get(GID, {}).get(UID)
+
+
+async def settle():
+    await asyncio.sleep(0.1)
+
+
+async def serve(body):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "state.sock")
+        server = StateServer()
+        unix_server = await asyncio.start_unix_server(server.handle, path)
+        try:
+            return await body(server, path)
+        finally:
+            unix_server.close()
+
+
+def test_own_changes_are_not_applied_twice():
+    async def body(server, path):
+        a, b = Process(path), Process(path)
+        await a.backend.start(a.statuses, {}, {})
+        await b.backend.start(b.statuses, {}, {})
+        for status in ("Modding", "Break", "Away"):
+            a.set_status(status)
+        await settle()
+        await a.backend.close()
+        await b.backend.close()
+        return a, b, server
+
+    a, b, server = asyncio.run(serve(body))
+    assert a.applied == []
+    assert b.applied == ["Modding", "Break", "Away"]
+    assert server.statuses[(GID, UID)] == "Away"
+    assert not a.backend._pending
+
+
+def test_concurrent_writes_settle_on_the_same_value():
+    async def body(server, path):
+        a, b = Process(path), Process(path)
+        await a.backend.start(a.statuses, {}, {})
+        await b.backend.start(b.statuses, {}, {})
+        a.set_status("Modding")
+        b.set_status("Break")
+        await settle()
+        await a.backend.close()
+        await b.backend.close()
+        return a, b, server
+
+    a, b, server = asyncio.run(serve(body))
+    assert a.status() == b.status() == server.statuses[(GID, UID)]
+
+
+def test_changes_made_while_disconnected_are_sent_on_reconnect():
+    async def body(server, path):
+        a, b = Process(path), Process(path)
+        await a.backend.start(a.statuses, {}, {})
+        a.set_status("Modding")
+        await settle()
+        await b.backend.start(b.statuses, {}, {})
+        for conn in list(server.clients):   # drop every connection; both reconnect
+            conn.close()
+        await asyncio.sleep(0)
+        a.set_status("Break")   # while a is disconnected
+        await settle()
+        await a.backend.close()
+        await b.backend.close()
+        return a, b, server
+
+    a, b, server = asyncio.run(serve(body))
+    assert a.applied == []   # the server's older Modding never came back
+    assert a.status() == b.status() == server.statuses[(GID, UID)] == "Break"
+    assert not a.backend._pending
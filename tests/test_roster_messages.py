@@ -0,0 +1,152 @@
+from types import SimpleNamespace
+
+import discord
+
+import bot.main as core
+from bench.fakediscord import FakeResponse, not_found
+
+
+async def mark_dirty(rid: int):
+    core.roster_edits.mark_dirty(rid)   # needs the running loop
+
+
+async def clock_in(rid: int, user_id: int):
+    """What /clock_in does once it has replied."""
+    core.set_status(rid, user_id, "Modding")
+    core.roster_edits.mark_dirty(rid)
+    core.roster_cog().drop_stale_reactions(rid, user_id, "Modding")
+
+
+def test_reactions_and_edits_do_not_fetch_the_roster_message(roster, gateway, http, settle):
+    rid, cid, mid = roster
+    gateway.react(cid, mid, 1001, core.EMO_ACTIVE)
+    settle()
+    gateway.react(cid, mid, 1001, core.EMO_BREAK)   # removes the Modding reaction
+    settle()
+    gateway.unreact(cid, mid, 1001, core.EMO_BREAK)
+    settle()
+    assert core.guild_user_status[rid][1001] == "Away"
+    assert http.calls["remove_reaction"] == 1
+    assert http.calls["edit_message"] >= 1
+    assert http.calls["get_message"] == 0
+
+
+def test_roster_message_handle_is_reused(roster, run, settle):
+    rid, cid, mid = roster
+    msg = core.get_roster_message(rid)
+    assert isinstance(msg, discord.PartialMessage) and msg.id == mid
+    run(mark_dirty(rid))
+    settle()
+    assert core.get_roster_message(rid) is msg
+
+
+def test_deleting_the_roster_message_drops_the_handle(roster, settle):
+    rid, cid, mid = roster
+    core.get_roster_message(rid)
+    core.bot.dispatch("raw_message_delete", discord.RawMessageDeleteEvent({"id": mid, "channel_id": cid, "guild_id": rid}))
+    settle()
+    assert rid not in core.roster_messages
+    assert rid not in core.rosters and mid not in core.roster_by_message
+
+
+def test_unknown_message_on_edit_forgets_the_roster(roster, run, http, settle):
+    rid, cid, mid = roster
+    core.get_roster_message(rid)
+    http.fail("edit_message", not_found(10008))
+    run(mark_dirty(rid))
+    settle()
+    assert rid not in core.roster_messages and rid not in core.rosters
+
+
+def test_only_unknown_message_on_reaction_removal_forgets_the_roster(roster, run, http):
+    rid, cid, mid = roster
+    cog = core.roster_cog()
+    http.fail("remove_reaction", not_found(10014, "Unknown Emoji"))
+    run(cog.remove_reactions(rid, 1001, [core.EMO_BREAK]))
+    assert rid in core.rosters and rid in core.roster_messages
+
+    http.fail("remove_reaction", not_found(10008))
+    run(cog.remove_reactions(rid, 1001, [core.EMO_BREAK]))
+    assert rid not in core.rosters and rid not in core.roster_messages
+
+
+def test_clocking_in_over_a_reaction_keeps_the_new_status(roster, gateway, run, http, settle):
+    rid, cid, mid = roster
+    gateway.react(cid, mid, 1003, core.EMO_BREAK)
+    settle()
+    assert core.guild_user_status[rid][1003] == "Break"
+    run(clock_in(rid, 1003))
+    settle()   # the bot's removal of the Break reaction is echoed back
+    assert http.calls["remove_reaction"] == 1
+    assert core.reaction_index[rid].emojis(1003) == set()
+    assert core.guild_user_status[rid][1003] == "Modding"
+
+
+def test_removing_your_status_reaction_still_clocks_out(roster, gateway, settle):
+    rid, cid, mid = roster
+    gateway.react(cid, mid, 1004, core.EMO_ACTIVE)
+    settle()
+    gateway.unreact(cid, mid, 1004, core.EMO_ACTIVE)
+    settle()
+    assert core.guild_user_status[rid][1004] == "Away"
+
+
+def test_status_button_over_a_reaction_keeps_the_new_status(roster, gateway, run, http, settle):
+    rid, cid, mid = roster
+    gateway.react(cid, mid, 1005, core.EMO_ACTIVE)
+    settle()
+    response = FakeResponse()
+    interaction = SimpleNamespace(guild=core.bot.get_guild(rid), message=SimpleNamespace(id=mid),
+                                  user=SimpleNamespace(id=1005), response=response)
+    run(core.on_roster_button(interaction, "Break"))
+    settle()
+    assert len(response.sent) == 1
+    assert http.calls["remove_reaction"] == 1
+    assert core.guild_user_status[rid][1005] == "Break"
+
+
+
+async def rename_all(rid: int, name: str):
+    for uid in range(1000, 1010):
+        core.refresh_name(rid, uid, f"{name}{uid}")
+
+
+def test_updated_line_moves_with_the_last_page(roster, run, http, settle):
+    rid, cid, mid = roster
+
+    def stamped():
+        pages = [mid, *core.roster_pages.get(rid, [])]
+        return [http.contents.get(page, "").count("*Updated") for page in pages]
+
+    for uid in range(1000, 1010):
+        core.set_status(rid, uid, "Modding")
+    run(mark_dirty(rid))
+    settle()
+    assert stamped() == [1]
+
+    # from two pages to one with the same first page: the first page was
+    # shown without the "Updated" line and must get it back
+    shown = core.rendered_pages[rid]
+    http.contents[mid] = shown[0]
+    http.contents[1] = "old second page\n*Updated*"
+    shown.append("old second page")
+    core.set_roster_pages(rid, [1])
+    run(mark_dirty(rid))
+    settle()
+    assert stamped() == [1] and 1 not in http.contents
+
+    run(rename_all(rid, "x" * 300))   # the names no longer fit one page
+    settle()
+    pages = stamped()
+    assert len(pages) > 1 and pages[-1] == 1 and sum(pages) == 1
+
+    # from one page to two with the same first page: it loses the line
+    for page in core.roster_pages[rid]:
+        del http.contents[page]
+    core.set_roster_pages(rid, [])
+    del core.rendered_pages[rid][1:]
+    http.contents[mid] += "\n*Updated*"
+    run(mark_dirty(rid))
+    settle()
+    pages = stamped()
+    assert len(pages) > 1 and pages[-1] == 1 and sum(pages) == 1
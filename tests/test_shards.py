@@ -0,0 +1,99 @@
+import asyncio
+
+import bot.main as core
+import bot.shards
+from bot.edits import ShardedEditScheduler
+from bot.shards import ShardedDict, ShardStats, shard_of
+
+GUILDS = [n << 22 for n in range(1, 9)]
+
+
+def test_sharded_dict_reshard_keeps_entries_in_their_shard():
+    named = {99: GUILDS[2]}   # a roster keyed by something other than its guild id
+    state = ShardedDict(guild_of=lambda key: named.get(key, key))
+    for gid in GUILDS:
+        state[gid] = gid + 1
+    state[99] = "named"
+    state.reshard(4)
+    assert dict(state) == {**{gid: gid + 1 for gid in GUILDS}, 99: "named"}
+    for gid in GUILDS:
+        assert state.shard(shard_of(gid, 4))[gid] == gid + 1
+    assert 99 in state.shard(shard_of(GUILDS[2], 4))
+    del state[GUILDS[0]]
+    assert GUILDS[0] not in state and len(state) == len(GUILDS)
+
+
+def test_edit_scheduler_reshard_flushes_pending_edits():
+    async def main():
+        flushed = []
+
+        async def flush(key: int):
+            flushed.append(key)
+
+        edits = ShardedEditScheduler(flush, shard_count=1, window=60, max_latency=60)
+        for gid in GUILDS:
+            edits.mark_dirty(gid)
+        assert edits.pending() == len(GUILDS)
+        await edits.reshard(4)
+        before = sorted(flushed)
+        edits.mark_dirty(GUILDS[1])
+        shard = edits.for_guild(GUILDS[1])
+        routed = edits.shards.index(shard) == shard_of(GUILDS[1], 4) and shard.pending() == 1
+        await edits.close()
+        return before, routed, flushed
+
+    before, routed, flushed = asyncio.run(main())
+    assert before == GUILDS
+    assert routed
+    assert flushed[-1] == GUILDS[1]
+
+
+def test_shard_stats_rate_covers_the_window(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(bot.shards.time, "monotonic", lambda: now[0])
+    stats = ShardStats(window=10)
+    for _ in range(20):
+        stats.record(0)
+    stats.record(1)
+    assert stats.rate(0) == 2.0 and stats.rate(1) == 0.1
+    now[0] += 5
+    for _ in range(10):
+        stats.record(0)
+    assert stats.rate(0) == 3.0
+    now[0] += 6   # the first second left the window
+    assert stats.rate(0) == 1.0
+    assert stats.totals == {0: 30, 1: 1}
+
+
+def test_partition_by_shard_keeps_rosters_working(gateway, run, http, settle):
+    rids = []
+    for gid in GUILDS[:4]:
+        gid += 1 << 40   # guilds no other test uses
+        gateway.add_guild(gid, [gid + 1], range(1000, 1010))
+        core.set_roster(gid, gid + 1, gid + 2)
+        core.set_status(gid, 1001, "Break")
+        rids.append(gid)
+    try:
+        core.bot.shard_count = 4
+        run(core.partition_by_shard())
+        assert core.rosters.shard_count == 4 and len(core.roster_edits.shards) == 4
+        for rid in rids:
+            assert core.rosters[rid] == (rid + 1, rid + 2)
+            assert core.guild_user_status[rid] == {1001: "Break"}
+            assert rid in core.rosters.shard(shard_of(rid, 4))
+
+        http.calls.clear()
+        seen = dict(core.shard_stats.totals)
+        for rid in rids:
+            gateway.react(rid + 1, rid + 2, 1002, core.EMO_ACTIVE)
+        settle()
+        assert http.calls["edit_message"] == len(rids)
+        for rid in rids:
+            assert core.guild_user_status[rid][1002] == "Modding"
+        for sid in {shard_of(rid, 4) for rid in rids}:
+            expected = sum(shard_of(rid, 4) == sid for rid in rids)
+            assert core.shard_stats.totals[sid] - seen.get(sid, 0) == expected
+    finally:
+        core.bot.shard_count = None
+        run(core.partition_by_shard())
+    assert core.rosters.shard_count == 1 and core.rosters[rids[0]] == (rids[0] + 1, rids[0] + 2)
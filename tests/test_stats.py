@@ -0,0 +1,87 @@
+import asyncio
+import os
+import tempfile
+import time
+
+from bot.stats import WINDOWS, ShiftStats
+from bot.store import StateStore
+
+DAY = WINDOWS["day"]
+G, U = 1, 10
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = float(int(time.time()))   # the store prunes by the real time
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_stretch_crossing_the_window_edge_is_clipped():
+    clock = FakeClock()
+    stats = ShiftStats(clock)
+    start = clock.now
+    stats.transition(G, U, "Modding", start)
+    stats.transition(G, U, "Break", start + 3600)
+    stats.transition(G, U, "Away", start + 3600 + 600)
+
+    clock.now = start + DAY + 1800   # the day window starts halfway through the shift
+    assert stats.totals(G, U, "day") == {"Modding": 1800, "Break": 600}
+    assert stats.totals(G, U, "week") == {"Modding": 3600, "Break": 600}
+
+    clock.now = start + DAY + 3600 + 300
+    assert stats.totals(G, U, "day") == {"Modding": 0, "Break": 300}
+    clock.now = start + DAY + 7200   # everything left the day window
+    assert stats.totals(G, U, "day") == {"Modding": 0, "Break": 0}
+    assert stats.totals(G, U, "week") == {"Modding": 3600, "Break": 600}
+
+
+def test_open_stretch_counts_up_to_now_within_the_window():
+    clock = FakeClock()
+    stats = ShiftStats(clock)
+    stats.transition(G, U, "Modding", clock.now - 2 * DAY)
+    assert stats.totals(G, U, "day")["Modding"] == DAY
+    assert stats.totals(G, U, "week")["Modding"] == 2 * DAY
+    assert not stats.transition(G, U, "Modding")
+    assert stats.top(G, "week") == [(U, 2 * DAY)]
+
+
+def test_totals_survive_a_reload_from_the_transitions_log():
+    clock = FakeClock()
+    now = clock.now
+    log = [
+        (G, U, "Modding", now - 40 * DAY),   # before the month window, still open at its start
+        (G, U, "Away", now - 20 * DAY),
+        (G, U, "Modding", now - 3 * DAY),
+        (G, U, "Break", now - 3 * DAY + 3600),
+        (G, U, "Modding", now - 3600),
+        (G, 11, "Break", now - 50 * DAY),     # closed long before any window
+        (G, 11, "Away", now - 45 * DAY),
+    ]
+    live = ShiftStats(clock)
+    for gid, uid, status, at in log:
+        live.transition(gid, uid, status, at)
+
+    async def reload():
+        with tempfile.TemporaryDirectory() as tmp:
+            store = StateStore(os.path.join(tmp, "state.db"), keep_transitions=max(WINDOWS.values()))
+            for row in log:
+                store.record_transition(*row)
+            store._next_prune = 0.0
+            await store.flush()
+            rows = StateStore(store.path).load_transitions(now - max(WINDOWS.values()))
+            await store.close()
+            return rows
+
+    rows = asyncio.run(reload())
+    # pruning keeps only each user's last transition before the month window
+    older = [row for row in rows if row[3] < now - 30 * DAY]
+    assert older == [(G, 11, "Away", now - 45 * DAY), (G, U, "Modding", now - 40 * DAY)]
+    restored = ShiftStats(clock)
+    for gid, uid, status, at in rows:
+        restored.transition(gid, uid, status, at)
+    for uid in (U, 11):
+        for window in WINDOWS:
+            assert restored.totals(G, uid, window) == live.totals(G, uid, window), (uid, window)
+    assert restored.totals(G, U, "month")["Modding"] == 10 * DAY + 3600 + 3600
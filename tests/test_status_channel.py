@@ -0,0 +1,42 @@
+from types import SimpleNamespace
+
+import bot.main as core
+from bench.fakediscord import BOT_ID, FakeResponse
+from bot.cogs.status_channel import meta_key
+
+A, B = 1 << 23, 3 << 23   # guilds no other test uses
+
+
+def set_channel(run, guild, channel):
+    cog = core.bot.get_cog("StatusChannel")
+    interaction = SimpleNamespace(guild=guild, response=FakeResponse())
+    run(cog.clock_setchannel.callback(cog, interaction, channel))
+    return interaction.response.sent
+
+
+def test_status_channel_is_kept_per_guild_and_stored(gateway, run, http, settle):
+    guilds = {gid: gateway.add_guild(gid, [gid + 1], [BOT_ID, 1000]) for gid in (A, B)}
+    for gid, guild in guilds.items():
+        core.set_roster(gid, gid + 1, gid + 2)
+        core.set_status(gid, 1000, "Modding")
+        assert set_channel(run, guild, guild.get_channel(gid + 1)) == [f"Clock channel set to #roster{gid + 1}."]
+    settle()
+    cog = core.bot.get_cog("StatusChannel")
+    assert cog.channels[A] == A + 1 and cog.channels[B] == B + 1
+    assert http.calls["edit_channel"] == 2
+    for gid in (A, B):
+        assert run(core.state_store.get_meta(meta_key(gid))) == str(gid + 1)
+
+    # after a restart the channel comes back from the state store
+    cog.channels.clear()
+    core.set_status(A, 1000, "Break")
+    run(core.roster_cog().flush_roster(A))
+    settle()
+    assert cog.channels == {A: A + 1}
+    assert http.calls["edit_channel"] == 3
+
+
+def test_setting_the_status_channel_needs_manage_channels(gateway):
+    cog = core.bot.get_cog("StatusChannel")
+    assert cog.clock_setchannel.default_permissions.manage_channels
+    assert cog.clock_setchannel.guild_only
@@ -0,0 +1,84 @@
+import asyncio
+
+from bot.timers import DeadlineScheduler
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def scheduler(expired=None) -> tuple:
+    clock = FakeClock()
+    on_expire = expired.append if expired is not None else (lambda keys: None)
+    return DeadlineScheduler(on_expire, batch=0.01, clock=clock), clock
+
+
+def test_rescheduling_later_skips_the_old_deadline():
+    timers, clock = scheduler()
+    timers.schedule("a", 1010)
+    timers.schedule("a", 1030)
+    assert timers._pop_due(1020) == []
+    assert timers.deadline("a") == 1030 and len(timers) == 1
+    assert timers._pop_due(1030) == ["a"]
+    assert len(timers) == 0
+
+
+def test_rescheduling_earlier_expires_once():
+    timers, clock = scheduler()
+    timers.schedule("a", 1030)
+    timers.schedule("a", 1010)
+    assert timers._pop_due(1010) == ["a"]
+    assert timers._pop_due(1030) == []
+
+
+def test_cancelled_keys_never_expire():
+    timers, clock = scheduler()
+    timers.schedule("a", 1010)
+    timers.schedule("b", 1010)
+    timers.cancel("a")
+    timers.cancel("missing")
+    assert timers._pop_due(1010) == ["b"]
+
+
+def test_keys_due_together_come_in_one_batch():
+    timers, clock = scheduler()
+    for key, deadline in (("c", 1003), ("a", 1001), ("late", 1100), ("b", 1002)):
+        timers.schedule(key, deadline)
+    assert timers._pop_due(1005) == ["a", "b", "c"]
+    assert timers.deadline("late") == 1100
+
+
+def test_heap_is_rebuilt_when_stale_entries_pile_up():
+    timers, clock = scheduler()
+    for i in range(1000):
+        timers.schedule("a", 2000 - i)
+    assert len(timers._heap) <= 2 * len(timers) + 65
+    assert timers._pop_due(1500) == ["a"]
+
+
+def test_task_expires_due_keys_in_one_call():
+    async def main():
+        expired = []
+        timers, clock = scheduler(expired)
+        timers.start()
+        timers.schedule("far", clock.now + 3600)
+        await asyncio.sleep(0.02)   # the task now waits for "far"
+        # earlier deadlines wake it; both are handed over together
+        timers.schedule("a", clock.now)
+        timers.schedule("b", clock.now - 1)
+        await asyncio.sleep(0.05)
+        timers.schedule("c", clock.now + 5)
+        timers.cancel("c")
+        clock.now += 10
+        timers.schedule("d", clock.now)
+        await asyncio.sleep(0.05)
+        await timers.close()
+        return expired, timers
+
+    expired, timers = asyncio.run(main())
+    assert expired == [["b", "a"], ["d"]]
+    assert timers.deadline("far") is not None
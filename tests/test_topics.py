@@ -0,0 +1,128 @@
+import asyncio
+
+import discord
+
+from bot.topics import TopicPublisher
+
+
+class FakeClock:
+    """A clock that only moves when the publisher sleeps."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    async def sleep(self, seconds: float):
+        self.now += seconds
+        await asyncio.sleep(0)
+
+
+class FakeChannel:
+    def __init__(self, channel_id: int, clock: FakeClock):
+        self.id = channel_id
+        self.clock = clock
+        self.edits = []   # (time, topic)
+        self.fail = False
+
+    async def edit(self, topic: str, reason: str):
+        if self.fail:
+            self.fail = False
+            raise discord.HTTPException(type("Response", (), {"status": 500, "reason": "Server Error"})(), "")
+        self.edits.append((self.clock(), topic))
+
+
+def publisher() -> tuple:
+    clock = FakeClock()
+    return TopicPublisher(rate=2, per=600, clock=clock, sleep=clock.sleep), clock
+
+
+async def drain(topics: TopicPublisher):
+    while topics.pending():
+        await asyncio.sleep(0)
+    await asyncio.sleep(0)
+
+
+def test_last_write_wins():
+    async def main():
+        topics, clock = publisher()
+        channel = FakeChannel(1, clock)
+        topics.submit(channel, "a")
+        topics.submit(channel, "b")
+        topics.submit(channel, "c")
+        await drain(topics)
+        return channel.edits, topics.published, topics.suppressed
+
+    edits, published, suppressed = asyncio.run(main())
+    assert edits == [(0.0, "c")]
+    assert (published, suppressed) == (1, 2)
+
+
+def test_topic_already_shown_is_dropped():
+    async def main():
+        topics, clock = publisher()
+        channel = FakeChannel(1, clock)
+        topics.submit(channel, "a")
+        await drain(topics)
+        topics.submit(channel, "a")
+        await drain(topics)
+        return channel.edits, topics.published, topics.suppressed
+
+    edits, published, suppressed = asyncio.run(main())
+    assert edits == [(0.0, "a")]
+    assert (published, suppressed) == (1, 1)
+
+
+def test_at_most_two_edits_in_any_ten_minutes():
+    async def main():
+        topics, clock = publisher()
+        channel = FakeChannel(1, clock)
+        for i in range(6):
+            topics.submit(channel, f"topic {i}")
+            await drain(topics)
+        return channel.edits
+
+    edits = asyncio.run(main())
+    times = [t for t, _ in edits]
+    assert times == [0.0, 0.0, 600.0, 600.0, 1200.0, 1200.0]
+    assert [topic for _, topic in edits] == [f"topic {i}" for i in range(6)]
+    for i, start in enumerate(times):
+        assert sum(start <= t < start + 600 for t in times[i:]) <= 2
+
+
+def test_waiting_topic_is_replaced_and_channels_are_independent():
+    async def main():
+        topics, clock = publisher()
+        busy, quiet = FakeChannel(1, clock), FakeChannel(2, clock)
+        topics.submit(busy, "a")
+        await drain(topics)
+        topics.submit(busy, "b")
+        await drain(topics)
+        topics.submit(quiet, "x")
+        # the busy channel's window is full: these wait, and only the newest is sent
+        topics.submit(busy, "c")
+        topics.submit(busy, "d")
+        await drain(topics)
+        return busy.edits, quiet.edits, topics.published, topics.suppressed
+
+    busy, quiet, published, suppressed = asyncio.run(main())
+    assert busy == [(0.0, "a"), (0.0, "b"), (600.0, "d")]
+    assert quiet == [(0.0, "x")]
+    assert (published, suppressed) == (4, 1)
+
+
+def test_failed_edit_is_not_counted():
+    async def main():
+        topics, clock = publisher()
+        channel = FakeChannel(1, clock)
+        channel.fail = True
+        topics.submit(channel, "a")
+        await drain(topics)
+        topics.submit(channel, "a")
+        await drain(topics)
+        return channel.edits, topics.published
+
+    edits, published = asyncio.run(main())
+    assert [topic for _, topic in edits] == ["a"]
+    assert published == 1